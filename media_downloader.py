@@ -2,7 +2,8 @@
 import asyncio
 import logging
 import os
-from datetime import date, datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from itertools import compress
 from typing import Dict, List, Optional, Set, Tuple, Union
 
 from rich.logging import RichHandler
@@ -19,7 +20,11 @@ from tqdm import tqdm
 
 from utils.chat_selector import ChatSelector
 from utils.config import ConfigManager
-from utils.file_management import get_next_name, manage_duplicate_file
+from utils.file_management import (
+    get_next_name,
+    manage_duplicate_file,
+    sanitize_filename,
+)
 from utils.filter import MediaFilter
 from utils.history import MessageHistory
 from utils.i18n import get_i18n
@@ -42,7 +47,7 @@ logger = logging.getLogger("media_downloader")
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
-class DownloadManager:
+class DownloadManager:  # pylint: disable=too-many-instance-attributes
     """Класс для управления загрузкой медиа из Telegram."""
 
     def __init__(self, config_manager: ConfigManager):
@@ -67,12 +72,24 @@ class DownloadManager:
 
         # Инициализировать сохранение истории, если включено
         self.history_manager: Optional[MessageHistory] = None
+        # Отдельный однопоточный пул для записи архива: запись сериализуется
+        # и не конкурирует с общим executor'ом loop'а
+        self._history_executor: Optional[ThreadPoolExecutor] = None
         download_settings = self.config.get("download_settings", {})
         if download_settings.get("download_message_history", False):
             base_dir = download_settings.get("base_directory") or THIS_DIR
             history_format = download_settings.get("history_format", "json")
             history_dir = download_settings.get("history_directory", "history")
             self.history_manager = MessageHistory(base_dir, history_format, history_dir, config_manager)
+            self._history_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="history-writer"
+            )
+
+    def close(self) -> None:
+        """Дождаться записи архива и остановить пул потоков истории."""
+        if self._history_executor is not None:
+            self._history_executor.shutdown(wait=True)
+            self._history_executor = None
 
     def _can_download(
         self, _type: str, file_formats: dict, file_format: Optional[str]
@@ -303,25 +320,7 @@ class DownloadManager:
         str
             Безопасное имя файла.
         """
-        # Недопустимые символы в Windows: < > : " / \ | ? *
-        # Заменяем на безопасные альтернативы
-        replacements = {
-            ':': '-',
-            '<': '_',
-            '>': '_',
-            '"': "'",
-            '/': '_',
-            '\\': '_',
-            '|': '_',
-            '?': '_',
-            '*': '_',
-            '+': '_',  # Для часовых поясов
-        }
-
-        for char, replacement in replacements.items():
-            filename = filename.replace(char, replacement)
-
-        return filename
+        return sanitize_filename(filename)
 
     async def _get_media_meta(
         self,
@@ -454,10 +453,6 @@ class DownloadManager:
                 if not _type or _type not in media_types:
                     return message.id
 
-                # Применить фильтры
-                if not self.media_filter.filter_message(message):
-                    return message.id
-
                 media_obj = message.photo if _type == "photo" else message.document
                 if not media_obj:
                     return message.id
@@ -632,6 +627,18 @@ class DownloadManager:
                 break
         return message.id
 
+    def _on_filter_error(self, message: Message, error: Exception) -> None:
+        """Записать сообщение, на котором упала проверка фильтров, в неудачные."""
+        logger.error(
+            self.i18n.t("download_exception", id=message.id, error=str(error)),
+            exc_info=error,
+        )
+        # Использовать chat_id из конфига для консистентности
+        chat_id = self.config.get("chat_id", 0)
+        if chat_id == 0:
+            chat_id = message.chat.id if message.chat else 0
+        self.failed_ids.append((chat_id, message.id))
+
     async def process_messages(
         self,
         client: TelegramClient,
@@ -684,11 +691,23 @@ class DownloadManager:
                     client, message, media_types, file_formats, download_directory
                 )
 
-        message_ids = await asyncio.gather(
-            *[download_with_semaphore(message) for message in messages]
+        # Фильтры применяются ко всей партии сразу (единственная точка фильтрации):
+        # для отсеянных сообщений не создаются задачи загрузки, их ID просто
+        # учитываются как прочитанные. Ошибка проверки одного сообщения не
+        # прерывает партию: сообщение записывается в неудачные, как при загрузке
+        mask = self.media_filter.filter_batch(messages, on_error=self._on_filter_error)
+        message_ids = [
+            message.id for message, passed in zip(messages, mask) if not passed
+        ]
+        message_ids.extend(
+            await asyncio.gather(
+                *[
+                    download_with_semaphore(message)
+                    for message in compress(messages, mask)
+                ]
+            )
         )
-        first_message = messages[0] if messages else None
-        chat = getattr(first_message, "chat", None) if first_message else None
+        chat = getattr(messages[0], "chat", None) if messages else None
         
         # Использовать chat_id из конфига (установлен в begin_import_chat),
         # а не из message.chat.id, т.к. message.chat.id может быть без префикса -100
@@ -719,8 +738,15 @@ class DownloadManager:
                 _chat_id,
                 len(messages),
             )
-            self.history_manager.save_batch(
-                messages, _chat_id, chat_title, chat_files
+            # Запись на диск — в отдельном потоке, чтобы не блокировать
+            # event loop (keepalive Telethon, прогресс других загрузок)
+            await asyncio.get_running_loop().run_in_executor(
+                self._history_executor,
+                self.history_manager.save_batch,
+                messages,
+                _chat_id,
+                chat_title,
+                chat_files,
             )
 
         last_message_id: int = max(message_ids)
@@ -764,6 +790,43 @@ class DownloadManager:
         self.config_manager.save()
         logger.info(self.i18n.t("updated_message_id"))
 
+    async def download_queue(
+        self,
+        client: TelegramClient,
+        queue_entries: List[Dict],
+        pagination_limit: int = 100,
+    ) -> None:
+        """
+        Загрузить чаты очереди по порядку и освободить ресурсы истории.
+
+        Parameters
+        ----------
+        client: TelegramClient
+            Клиент Telethon (уже подключенный).
+        queue_entries: List[Dict]
+            Записи чатов из конфига с ключами "chat_id" и "title".
+        pagination_limit: int
+            Количество сообщений для загрузки асинхронно как пакет.
+        """
+        # close() в finally: запись архива дожидается завершения и пул потоков
+        # истории останавливается и при исключении или KeyboardInterrupt
+        try:
+            for c in queue_entries:
+                chat_id = c["chat_id"]
+                chat_title = c.get("title", "")
+                logger.info(
+                    "Начало загрузки для чата: %s (chat_id=%s)",
+                    chat_title or chat_id,
+                    chat_id,
+                )
+                # Временно установить chat_id для этого чата
+                self.config["chat_id"] = chat_id
+                await self.begin_import_chat(
+                    client, chat_id, chat_title, pagination_limit
+                )
+        finally:
+            self.close()
+
     async def begin_import_chat(  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
         self, client: TelegramClient, chat_id: int, chat_title: Optional[str] = None, pagination_limit: int = 100
     ) -> None:
@@ -782,29 +845,10 @@ class DownloadManager:
             Количество сообщений для загрузки асинхронно как пакет.
         """
         last_read_message_id: int = self.config.get("last_read_message_id", 0)
-        start_date_val = self.config.get("start_date")
-        if isinstance(start_date_val, str) and start_date_val.strip():
-            start_date = datetime.fromisoformat(start_date_val)
-            if start_date.tzinfo is None:
-                start_date = start_date.replace(tzinfo=timezone.utc)
-        elif isinstance(start_date_val, date):
-            start_date = datetime.combine(
-                start_date_val, datetime.min.time(), tzinfo=timezone.utc
-            )
-        else:
-            start_date = None
+        # Даты фильтра уже разобраны MediaFilter при инициализации
+        start_date = self.media_filter.start_date
         logger.info(self.i18n.t("start_date_filter", date=start_date or "None"))
-        end_date_val = self.config.get("end_date")
-        if isinstance(end_date_val, str) and end_date_val.strip():
-            end_date = datetime.fromisoformat(end_date_val)
-            if end_date.tzinfo is None:
-                end_date = end_date.replace(tzinfo=timezone.utc)
-        elif isinstance(end_date_val, date):
-            end_date = datetime.combine(
-                end_date_val, datetime.min.time(), tzinfo=timezone.utc
-            )
-        else:
-            end_date = None
+        end_date = self.media_filter.end_date
         logger.info(self.i18n.t("end_date_filter", date=end_date or "None"))
         max_messages_val = self.config.get("max_messages")
         if isinstance(max_messages_val, int):
@@ -997,13 +1041,16 @@ async def main_async():
     """Асинхронная главная функция загрузчика."""
     config_manager = ConfigManager()
     try:
-        config = config_manager.load()
+        config_manager.load()
     except FileNotFoundError as e:
         logger.error(str(e))
         return
     except ValueError as e:
         logger.error(f"Ошибка валидации конфигурации: {e}")
         return
+    # Здесь конфигурация только читается: представление без копирования,
+    # изменения вносятся через config_manager
+    config = config_manager.view
 
     # Создать клиент для выбора чатов
     proxy_config = get_proxy_config(config)
@@ -1083,7 +1130,7 @@ async def main_async():
     pagination_limit = config.get("download_settings", {}).get("pagination_limit", 100)
 
     # Очередь загрузки: берём из конфига (с учётом order), чтобы порядок был стабильным и редактируемым
-    cfg_after = config_manager.config
+    cfg_after = config_manager.view
     queue_entries = [
         c for c in cfg_after.get("chats", [])
         if isinstance(c, dict) and c.get("enabled", True) and "chat_id" in c
@@ -1091,20 +1138,7 @@ async def main_async():
     if any("order" in c for c in queue_entries):
         queue_entries.sort(key=lambda c: int(c.get("order", 10**9)) if str(c.get("order", "")).lstrip("-").isdigit() else 10**9)
 
-    for c in queue_entries:
-        chat_id = c["chat_id"]
-        chat_title = c.get("title", "")
-        logger.info(
-            "Начало загрузки для чата: %s (chat_id=%s)",
-            chat_title or chat_id,
-            chat_id,
-        )
-        # Временно установить chat_id для этого чата
-        download_manager.config["chat_id"] = chat_id
-        await download_manager.begin_import_chat(
-            client, chat_id, chat_title, pagination_limit
-        )
-
+    await download_manager.download_queue(client, queue_entries, pagination_limit)
     await client.disconnect()
 
     if download_manager.failed_ids:
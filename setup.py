@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 from utils import __version__
 
@@ -40,4 +40,8 @@ setup(
         "Source": "https://github.com/Dineshkarthik/telegram_media_downloader",
     },
     python_requires="~=3.8",
+    extras_require={
+        # Быстрая сериализация архива истории (JSONL); без него используется json
+        "fast": ["orjson>=3.6"],
+    },
 )
@@ -347,6 +347,41 @@ class MediaDownloaderTestCase(unittest.TestCase):
         result = self.loop.run_until_complete(dm.download_media(client, msg_refetch, ["video"], {"video": ["all"]}))
         self.assertEqual(result, 7)
 
+    def test_process_messages_filters_each_message_once(self):
+        dm = self._make_manager()
+        client = MockClient()
+        messages = [MockMessage(id=i, media=None) for i in (1, 2, 3)]
+        calls = []
+
+        def predicate(message):
+            calls.append(message.id)
+            if message.id == 3:
+                raise ValueError("bad date")
+            return message.id == 1
+
+        dm.media_filter._predicate = predicate  # type: ignore[assignment]
+        with mock.patch.object(dm, "download_media", wraps=dm.download_media) as download_media:
+            result = self.loop.run_until_complete(
+                dm.process_messages(client, messages, ["all"], {"video": ["all"]})
+            )
+
+        self.assertEqual(result, 3)
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual([c.args[1].id for c in download_media.call_args_list], [1])
+        self.assertEqual(dm.failed_ids, [(123456, 3)])
+
+    def test_download_queue_closes_on_error(self):
+        dm = self._make_manager()
+        queue = [{"chat_id": 1, "title": "A"}, {"chat_id": 2, "title": "B"}]
+        with mock.patch.object(
+            dm, "begin_import_chat", side_effect=KeyboardInterrupt
+        ) as begin_import_chat, mock.patch.object(dm, "close") as close:
+            with self.assertRaises(KeyboardInterrupt):
+                self.loop.run_until_complete(dm.download_queue(MockClient(), queue, 50))
+
+        begin_import_chat.assert_called_once_with(mock.ANY, 1, "A", 50)
+        close.assert_called_once_with()
+
     @classmethod
     def tearDownClass(cls):
         asyncio.set_event_loop(None)
@@ -1,6 +1,7 @@
 """Unittest module for config manager."""
 
 import os
+import sys
 import tempfile
 import unittest
 
@@ -60,6 +61,146 @@ class ConfigManagerTestCase(unittest.TestCase):
         self.assertEqual(chats[100]["order"], 0)
         self.assertEqual(chats[300]["order"], 1)
 
+    def test_add_chat_to_download_list_uses_chat_index(self):
+        from utils.config import ConfigManager
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cfg_path = os.path.join(tmpdir, "config.yaml")
+            with open(cfg_path, "w", encoding="utf-8") as f:
+                yaml.safe_dump(
+                    {"api_id": 1, "api_hash": "x", "chats": [{"chat_id": 10, "order": 4, "enabled": True}]},
+                    f,
+                )
+
+            mgr = ConfigManager(config_path=cfg_path)
+            mgr.load()
+            self.assertTrue(mgr.add_chat_to_download_list(20, "New"))
+            self.assertFalse(mgr.add_chat_to_download_list(20, "Renamed"))
+            self.assertTrue(mgr.add_chat_to_download_list(30))
+            mgr.update_chat_state(20, 7, [1])
+            # Список, изменённый в обход менеджера, тоже учитывается
+            mgr.config["chats"].append({"chat_id": 40, "order": 9})
+            self.assertFalse(mgr.add_chat_to_download_list(40))
+            self.assertTrue(mgr.add_chat_to_download_list(50))
+
+        chats = {c["chat_id"]: c for c in mgr.config["chats"]}
+        self.assertEqual(chats[20]["order"], 5)
+        self.assertEqual(chats[20]["title"], "Renamed")
+        self.assertEqual(chats[20]["last_read_message_id"], 7)
+        self.assertEqual(chats[30]["order"], 6)
+        self.assertEqual(chats[50]["order"], 10)
+        self.assertEqual(len(mgr.config["chats"]), 5)
+
+    def test_load_returns_independent_config_per_manager(self):
+        from utils.config import ConfigManager
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cfg_path = os.path.join(tmpdir, "config.yaml")
+            with open(cfg_path, "w", encoding="utf-8") as f:
+                yaml.safe_dump({"api_id": 1, "api_hash": "x", "chats": []}, f)
+
+            first = ConfigManager(config_path=cfg_path).load()
+            first["chats"].append({"chat_id": 1})
+            second = ConfigManager(config_path=cfg_path).load()
+            self.assertEqual(second["chats"], [])
+
+            with open(cfg_path, "w", encoding="utf-8") as f:
+                yaml.safe_dump({"api_id": 2, "api_hash": "changed"}, f)
+            self.assertEqual(ConfigManager(config_path=cfg_path).load()["api_hash"], "changed")
+
+    def test_invalid_proxy_logged_on_every_load(self):
+        from utils.config import ConfigManager
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cfg_path = os.path.join(tmpdir, "config.yaml")
+            proxy = {"scheme": "ftp", "hostname": "h", "port": 1}
+            with open(cfg_path, "w", encoding="utf-8") as f:
+                yaml.safe_dump({"api_id": 1, "api_hash": "x", "proxy": proxy}, f)
+
+            for _ in range(2):
+                with self.assertLogs("utils.config", level="ERROR") as logs:
+                    config = ConfigManager(config_path=cfg_path).load()
+                self.assertIn("ftp", "\n".join(logs.output))
+                self.assertIsNone(config["proxy"])
+
+    def test_save_skips_unchanged_config(self):
+        from unittest import mock
+
+        from utils.config import ConfigManager
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cfg_path = os.path.join(tmpdir, "config.yaml")
+            with open(cfg_path, "w", encoding="utf-8") as f:
+                yaml.safe_dump({"api_id": 1, "api_hash": "x", "chats": []}, f)
+
+            mgr = ConfigManager(config_path=cfg_path)
+            mgr.load()
+            mgr.save()
+            with mock.patch("utils.config.os.replace") as replace:
+                mgr.save()
+            replace.assert_not_called()
+
+            mgr.update_chat_state(5, 10, [])
+            mgr.save()
+            # Файл изменён в обход менеджера: сохранение снова записывает его
+            with open(cfg_path, "a", encoding="utf-8") as f:
+                f.write("# comment\n")
+            with mock.patch("utils.config.os.replace", wraps=os.replace) as replace:
+                mgr.save()
+            replace.assert_called_once()
+            with open(cfg_path, "r", encoding="utf-8") as f:
+                saved = yaml.safe_load(f)
+        self.assertEqual(saved["chats"][0]["last_read_message_id"], 10)
+
+    def test_view_is_read_only_and_tracks_changes(self):
+        from utils.config import ConfigManager
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cfg_path = os.path.join(tmpdir, "config.yaml")
+            with open(cfg_path, "w", encoding="utf-8") as f:
+                yaml.safe_dump({"api_id": 1, "api_hash": "x", "chats": []}, f)
+
+            mgr = ConfigManager(config_path=cfg_path)
+            view = mgr.view
+            self.assertEqual(view["api_hash"], "x")
+            with self.assertRaises(TypeError):
+                view["api_hash"] = "y"  # type: ignore[index]
+            mgr.set("media_types", ["photo"])
+            self.assertIs(mgr.view, view)
+            self.assertEqual(view["media_types"], ["photo"])
+
+    def test_readers_accept_read_only_view(self):
+        from types import MappingProxyType
+
+        from utils.chat_selector import ChatSelector
+        from utils.proxy import get_proxy_config
+
+        tui = MappingProxyType({"display": MappingProxyType({"show_chat_id": False})})
+        view = MappingProxyType({"tui": tui})
+        selector = ChatSelector(client=None, tui_config=view["tui"])
+        self.assertFalse(selector._get_tui_config()["display"]["show_chat_id"])
+        self.assertIsNone(get_proxy_config(view))
+
+    def test_save_is_atomic_and_keeps_file_mode(self):
+        from utils.config import ConfigManager
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cfg_path = os.path.join(tmpdir, "config.yaml")
+            with open(cfg_path, "w", encoding="utf-8") as f:
+                yaml.safe_dump({"api_id": 1, "api_hash": "x"}, f)
+            os.chmod(cfg_path, 0o600)
+
+            mgr = ConfigManager(config_path=cfg_path)
+            mgr.load()
+            mgr.set("language", "en")
+            mgr.save()
+
+            self.assertEqual(os.listdir(tmpdir), ["config.yaml"])
+            if os.name == "posix":
+                self.assertEqual(os.stat(cfg_path).st_mode & 0o777, 0o600)
+            with open(cfg_path, "r", encoding="utf-8") as f:
+                self.assertEqual(yaml.safe_load(f)["language"], "en")
+
     def test_filter_chat_items_search_and_filter(self):
         from utils.chat_selector import ChatListItem, ChatSelector
 
@@ -81,3 +222,92 @@ class ConfigManagerTestCase(unittest.TestCase):
         filtered = ChatSelector.filter_chat_items(items, filter_mode="all", search_query="1")
         self.assertEqual([i.chat_id for i in filtered], [1])
 
+    def test_filter_chats_uses_cached_title_search_keys(self):
+        from utils.chat_selector import ChatSelector
+
+        selector = ChatSelector(client=None)
+        chats = [(1, "Dev Chat", "group"), (2, "News", "channel"), (3, "Alice", "user")]
+
+        self.assertEqual(selector.filter_chats(chats, search_query="CHAT"), [chats[0]])
+        self.assertEqual(selector._title_search_keys[2], "news")
+        self.assertEqual(selector.filter_chats(chats, chat_type="user", search_query="ali"), [chats[2]])
+
+    def test_filter_chat_items_multi_token_search(self):
+        from utils.chat_selector import ChatListItem, ChatSelector
+
+        items = [
+            ChatListItem(chat_id=10, title="Python dev chat", chat_type="group"),
+            ChatListItem(chat_id=20, title="Dev news", chat_type="channel"),
+            ChatListItem(chat_id=30, title="Python news", chat_type="channel"),
+        ]
+
+        filtered = ChatSelector.filter_chat_items(items, search_query="chat  python")
+        self.assertEqual([i.chat_id for i in filtered], [10])
+
+        filtered = ChatSelector.filter_chat_items(items, search_query="news 30")
+        self.assertEqual([i.chat_id for i in filtered], [30])
+
+    def test_filter_chat_items_casefold_search(self):
+        from utils.chat_selector import ChatListItem, ChatSelector
+
+        items = [
+            ChatListItem(chat_id=1, title="Straße", chat_type="group"),
+            ChatListItem(chat_id=2, title="ＮＥＷＳ Канал", chat_type="channel"),
+        ]
+        self.assertEqual(items[0].title_search, "strasse")
+        self.assertEqual(items[0], ChatListItem(chat_id=1, title="Straße", chat_type="group"))
+
+        filtered = ChatSelector.filter_chat_items(items, search_query="STRASSE")
+        self.assertEqual([i.chat_id for i in filtered], [1])
+
+        filtered = ChatSelector.filter_chat_items(items, search_query="news канал")
+        self.assertEqual([i.chat_id for i in filtered], [2])
+
+    def test_capture_output_to_file_restores_stdio_and_handlers(self):
+        import logging
+
+        from utils.chat_selector import _capture_output_to_file
+
+        root_logger = logging.getLogger()
+        stream_handler = logging.StreamHandler()
+        root_logger.addHandler(stream_handler)
+        self.addCleanup(root_logger.removeHandler, stream_handler)
+        handlers = root_logger.handlers
+        saved_stdout = sys.stdout
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_path = os.path.join(tmpdir, "tui-debug.log")
+            with _capture_output_to_file(log_path):
+                print("captured")
+                self.assertNotIn(stream_handler, root_logger.handlers)
+            with open(log_path, "r", encoding="utf-8") as f:
+                self.assertIn("captured", f.read())
+
+        self.assertIs(sys.stdout, saved_stdout)
+        self.assertIs(root_logger.handlers, handlers)
+        self.assertIn(stream_handler, root_logger.handlers)
+
+    @unittest.skipIf(sys.version_info < (3, 10), "dataclass(slots=True) доступен с Python 3.10")
+    def test_chat_list_item_uses_slots(self):
+        import dataclasses
+
+        from utils.chat_selector import ChatListItem
+
+        item = ChatListItem(chat_id=1, title="Dev", chat_type="group")
+        self.assertFalse(hasattr(item, "__dict__"))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            item.title = "Other"  # type: ignore[misc]
+        self.assertIn(item, {ChatListItem(chat_id=1, title="Dev", chat_type="group")})
+
+    def test_filter_chats_multiple_types_single_pass(self):
+        from utils.chat_selector import ChatSelector
+
+        selector = ChatSelector(client=None)
+        chats = [(1, "Dev", "group"), (2, "Alice", "user"), (3, "News", "channel"), (4, "Devops", "channel")]
+
+        self.assertIs(selector.filter_chats(chats), chats)
+        self.assertEqual(selector.filter_chats(chats, chat_types=("group", "channel")), [chats[0], chats[2], chats[3]])
+        self.assertEqual(
+            selector.filter_chats(chats, search_query="dev", chat_types=("channel",)),
+            [chats[3]],
+        )
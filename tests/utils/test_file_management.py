@@ -8,7 +8,11 @@ from pathlib import Path
 from unittest import mock
 
 sys.path.append("..")  # Adds higher directory to python modules path.
-from utils.file_management import get_next_name, manage_duplicate_file
+from utils.file_management import (
+    get_next_name,
+    manage_duplicate_file,
+    sanitize_filename,
+)
 
 
 class FileManagementTestCase(unittest.TestCase):
@@ -35,6 +39,92 @@ class FileManagementTestCase(unittest.TestCase):
         result1 = manage_duplicate_file(self.test_file_copy_1)
         self.assertEqual(result1, self.test_file_copy_1)
 
+    def test_manage_duplicate_file_skips_hash_for_other_sizes(self):
+        with mock.patch("utils.file_management._get_file_hash") as get_hash:
+            result = manage_duplicate_file(self.test_file)
+        self.assertEqual(result, self.test_file)
+        get_hash.assert_not_called()
+
+    def test_manage_duplicate_file_with_pattern_chars_in_name(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            original = os.path.join(tmpdir, "clip [1080p].mp4")
+            copy = os.path.join(tmpdir, "clip [1080p]-copy1.mp4")
+            os.makedirs(os.path.join(tmpdir, "clip [1080p] dir"))
+            for path in (original, copy):
+                with open(path, "wb") as f:
+                    f.write(b"same bytes")
+
+            self.assertEqual(manage_duplicate_file(copy), original)
+            self.assertFalse(os.path.exists(copy))
+
+    def test_manage_duplicate_file_several_candidates(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            original = os.path.join(tmpdir, "song.mp3")
+            other = os.path.join(tmpdir, "song-copy1.mp3")
+            copy = os.path.join(tmpdir, "song-copy2.mp3")
+            for path, data in ((original, b"same bytes"), (other, b"diff bytes"), (copy, b"same bytes")):
+                with open(path, "wb") as f:
+                    f.write(data)
+
+            self.assertEqual(manage_duplicate_file(copy), original)
+            self.assertFalse(os.path.exists(copy))
+            self.assertTrue(os.path.exists(other))
+
+    def test_manage_duplicate_file_relative_path_not_matched_with_itself(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "dir"))
+            with open(os.path.join(tmpdir, "dir", "a.txt"), "wb") as f:
+                f.write(b"only file")
+            cwd = os.getcwd()
+            os.chdir(tmpdir)
+            try:
+                path = "./dir/a.txt"
+                self.assertEqual(manage_duplicate_file(path), path)
+                self.assertTrue(os.path.exists(path))
+            finally:
+                os.chdir(cwd)
+
+    def test_sanitize_filename(self):
+        self.assertEqual(
+            sanitize_filename('a:b<c>d"e/f\\g|h?i*j+k.txt'), "a-b_c_d'e_f_g_h_i_j_k.txt"
+        )
+        self.assertEqual(sanitize_filename("photo_2024-01-01.jpg"), "photo_2024-01-01.jpg")
+
+    def test_get_file_hash_streams_in_chunks(self):
+        import hashlib
+
+        from utils import file_management
+
+        data = os.urandom(3 * 1024 + 17)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "big.bin")
+            with open(path, "wb") as f:
+                f.write(data)
+            expected = hashlib.blake2b(data, digest_size=16).hexdigest()
+            with mock.patch.object(file_management, "_HASH_CHUNK_SIZE", 1024), mock.patch.object(
+                file_management.hashlib, "file_digest", None, create=True
+            ):
+                file_management.clear_hash_cache()
+                self.assertEqual(file_management._get_file_hash(path), expected)
+            file_management.clear_hash_cache()
+            self.assertEqual(file_management._get_file_hash(path), expected)
+            file_management.clear_hash_cache()
+
+    def test_get_file_hash_cache_tracks_file_changes(self):
+        from utils import file_management
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "a.bin")
+            with open(path, "wb") as f:
+                f.write(b"first")
+            first = file_management._get_file_hash(path)
+            # Другое написание того же пути попадает в ту же запись кеша
+            self.assertEqual(file_management._get_file_hash(os.path.join(tmpdir, ".", "a.bin")), first)
+            with open(path, "wb") as f:
+                f.write(b"second version")
+            self.assertNotEqual(file_management._get_file_hash(path), first)
+        file_management.clear_hash_cache()
+
     def tearDown(self):
         os.remove(self.test_file)
         os.remove(self.test_file_copy_1)
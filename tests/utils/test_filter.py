@@ -0,0 +1,126 @@
+"""Unittest module for message filters."""
+
+import sys
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.append("..")  # Adds higher directory to python modules path.
+from utils.filter import MediaFilter
+
+
+def _message(sender_id=1, day=15, username=None):
+    return SimpleNamespace(
+        sender_id=sender_id,
+        sender=SimpleNamespace(username=username),
+        date=datetime(2024, 1, day, tzinfo=timezone.utc),
+    )
+
+
+class MediaFilterTestCase(unittest.TestCase):
+    def test_no_filters_pass_everything(self):
+        media_filter = MediaFilter({})
+        self.assertTrue(media_filter.filter_message(_message(sender_id=None)))
+
+    def test_uses_slots(self):
+        media_filter = MediaFilter({"sender_filter": {"enabled": True, "user_ids": [1]}})
+        self.assertFalse(hasattr(media_filter, "__dict__"))
+
+    def test_sender_filter(self):
+        media_filter = MediaFilter({"sender_filter": {"enabled": True, "user_ids": ["10", 20]}})
+        self.assertTrue(media_filter.filter_message(_message(sender_id=10)))
+        self.assertTrue(media_filter.filter_message(_message(sender_id=20)))
+        self.assertFalse(media_filter.filter_message(_message(sender_id=30)))
+        self.assertFalse(media_filter.filter_message(_message(sender_id=None)))
+
+        empty = MediaFilter({"sender_filter": {"enabled": True}})
+        self.assertFalse(empty.filter_message(_message()))
+
+    def test_username_filter(self):
+        media_filter = MediaFilter({"sender_filter": {"enabled": True, "usernames": ["@Alice", " bob "]}})
+        self.assertTrue(media_filter.filter_message(_message(sender_id=5, username="alice")))
+        self.assertTrue(media_filter.filter_message(_message(sender_id=6, username="BOB")))
+        self.assertFalse(media_filter.filter_message(_message(sender_id=7, username="carol")))
+        self.assertFalse(media_filter.filter_message(_message(sender_id=8)))
+
+        both = MediaFilter({"sender_filter": {"enabled": True, "user_ids": [1], "usernames": ["alice"]}})
+        self.assertTrue(both.filter_message(_message(sender_id=1)))
+        self.assertTrue(both.filter_message(_message(sender_id=2, username="Alice")))
+        self.assertTrue(both.should_download_by_sender(_message(sender_id=2, username="Alice")))
+        self.assertFalse(both.filter_message(_message(sender_id=2, username="bob")))
+
+    def test_username_filter_without_loaded_sender(self):
+        # Отправитель не загружен (или без username): по usernames сообщение не проходит
+        message = SimpleNamespace(sender_id=5, sender=None, date=datetime(2024, 1, 15, tzinfo=timezone.utc))
+        usernames_only = MediaFilter({"sender_filter": {"enabled": True, "usernames": ["alice"]}})
+        self.assertFalse(usernames_only.filter_message(message))
+        self.assertFalse(usernames_only.should_download_by_sender(message))
+        self.assertFalse(usernames_only.filter_message(_message(sender_id=5, username=None)))
+
+        # Совпадение по user_id по-прежнему работает без загруженного отправителя
+        both = MediaFilter({"sender_filter": {"enabled": True, "user_ids": [5], "usernames": ["alice"]}})
+        self.assertTrue(both.filter_message(message))
+
+    def test_date_bounds(self):
+        media_filter = MediaFilter({"start_date": "2024-01-10", "end_date": "2024-01-20"})
+        self.assertFalse(media_filter.filter_message(_message(day=1)))
+        self.assertTrue(media_filter.filter_message(_message(day=10)))
+        self.assertTrue(media_filter.filter_message(_message(day=15)))
+        self.assertFalse(media_filter.filter_message(_message(day=31)))
+
+        open_end = MediaFilter({"start_date": "2024-01-10"})
+        self.assertTrue(open_end.filter_message(_message(day=31)))
+
+    def test_reload_rebuilds_predicate(self):
+        media_filter = MediaFilter({})
+        self.assertTrue(media_filter.filter_message(_message(day=1)))
+        media_filter.reload({"start_date": "2024-01-10"})
+        self.assertFalse(media_filter.filter_message(_message(day=1)))
+        self.assertEqual(media_filter.start_date, datetime(2024, 1, 10, tzinfo=timezone.utc))
+
+    def test_filter_batch_mask(self):
+        media_filter = MediaFilter({"sender_filter": {"enabled": True, "user_ids": [1]}, "end_date": "2024-01-20"})
+        messages = [_message(1), _message(2), _message(1, day=31), _message(None)]
+        self.assertEqual(media_filter.filter_batch(messages), [True, False, False, False])
+        self.assertEqual(media_filter.filter_batch([]), [])
+
+        errors = []
+        broken = SimpleNamespace(sender_id=1, sender=None, date="not a date")
+        mask = media_filter.filter_batch([_message(1), broken], on_error=lambda m, e: errors.append(m))
+        self.assertEqual(mask, [True, False])
+        self.assertEqual(errors, [broken])
+        with self.assertRaises(AttributeError):
+            media_filter.filter_batch([broken])
+
+    def test_size_predicate(self):
+        sizes = (None, 0, 10, 15, 20, 30)
+        expected = {
+            (None, None): [True, True, True, True, True, True],
+            (10, None): [True, False, True, True, True, True],
+            (None, 20): [True, True, True, True, True, False],
+            (10, 20): [True, False, True, True, True, False],
+        }
+        for (min_size, max_size), results in expected.items():
+            predicate = MediaFilter.make_size_predicate(min_size, max_size)
+            self.assertIs(MediaFilter.make_size_predicate(min_size, max_size), predicate)
+            self.assertEqual([predicate(size) for size in sizes], results)
+            self.assertEqual(
+                [MediaFilter.should_download_by_size(size, min_size, max_size) for size in sizes], results
+            )
+
+    def test_predicate_matches_separate_checks(self):
+        for enabled in (False, True):
+            for user_ids in ([], [1]):
+                for usernames in ([], ["name"]):
+                    config = {
+                        "sender_filter": {"enabled": enabled, "user_ids": user_ids, "usernames": usernames},
+                        "start_date": "2024-01-10",
+                    }
+                    media_filter = MediaFilter(config)
+                    messages = (_message(None), _message(1), _message(2), _message(2, username="Name"), _message(1, day=1))
+                    for message in messages:
+                        expected = media_filter.should_download_by_sender(message) and (
+                            media_filter.should_download_by_date(message.date, media_filter.start_date)
+                        )
+                        self.assertEqual(media_filter.filter_message(message), expected)
+
@@ -6,6 +6,12 @@ import sys
 import tempfile
 import unittest
 from datetime import datetime, timezone
+from types import SimpleNamespace
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson не установлен
+    orjson = None
 
 sys.path.append("..")  # Adds higher directory to python modules path.
 
@@ -18,6 +24,25 @@ except Exception:  # pragma: no cover - optional dependency (telethon) may be mi
     _HISTORY_AVAILABLE = False
 
 
+def _message(msg_id, text=None, **fields):
+    """Минимальное сообщение Telethon для записи в историю."""
+    data = dict(
+        id=msg_id,
+        date=datetime(2020, 1, 1, 0, 0, msg_id % 60, tzinfo=timezone.utc),
+        message=f"msg{msg_id}" if text is None else text,
+        media=None,
+        sender_id=7,
+        reply_to=None,
+        reply_to_msg_id=None,
+        edit_date=None,
+        views=None,
+        forwards=None,
+        entities=None,
+    )
+    data.update(fields)
+    return SimpleNamespace(**data)
+
+
 @unittest.skipUnless(_HISTORY_AVAILABLE, "utils.history/telethon not available")
 class HistoryTestCase(unittest.TestCase):
     def test_format_message_html_shows_date_and_time(self):
@@ -223,3 +248,216 @@ class HistoryTestCase(unittest.TestCase):
                 lines = [ln.strip() for ln in f if ln.strip()]
             self.assertEqual(len(lines), 3, "Новое сообщение должно было добавиться")
 
+    def test_save_batch_json_matches_save_message(self):
+        """Пакетная запись JSONL даёт те же строки, что и запись по одному сообщению."""
+        messages = [_message(1), _message(2), _message(3)]
+        with tempfile.TemporaryDirectory() as batch_dir, tempfile.TemporaryDirectory() as single_dir:
+            batch = MessageHistory(base_directory=batch_dir, history_format="json")
+            batch.save_batch(messages, -5, "T", {2: "/tmp/file.bin"})
+            single = MessageHistory(base_directory=single_dir, history_format="json")
+            for message in messages:
+                single.save_message(message, -5, "T", "/tmp/file.bin" if message.id == 2 else None)
+
+            with open(os.path.join(batch_dir, "history", "chat_5.jsonl"), encoding="utf-8") as f:
+                batch_lines = f.read()
+            with open(os.path.join(single_dir, "history", "chat_5.jsonl"), encoding="utf-8") as f:
+                single_lines = f.read()
+            self.assertEqual(batch_lines, single_lines)
+            self.assertEqual(json.loads(batch_lines.splitlines()[1])["downloaded_file"], "/tmp/file.bin")
+            self.assertEqual(batch.chats_info[-5]["message_count"], 3)
+            self.assertEqual(batch.chats_info[-5]["last_message_date"], messages[-1].date)
+            self.assertEqual(batch.chats_info, single.chats_info)
+
+    def test_check_archive_duplicates_reads_ids_and_caches(self):
+        from unittest import mock
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = MessageHistory(base_directory=tmpdir, history_format="json")
+            path = os.path.join(history.history_path, "chat_1.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('{"id": 1, "text": "\\"id\\": 7", "reply_to_msg_id": 9}\n')
+                f.write("\n")
+                f.write('{"text": "x", "id": 2}\n')
+                f.write('{"id": 4, "text": "недописан')
+
+            self.assertTrue(history._check_archive_duplicates(path, [2, 1], "jsonl"))
+            self.assertFalse(history._check_archive_duplicates(path, [1, 7], "jsonl"))
+            self.assertFalse(history._check_archive_duplicates(path, [9], "jsonl"))
+            self.assertFalse(history._check_archive_duplicates(path, [4], "jsonl"))
+            rescan = mock.patch("utils.history.mmap.mmap", side_effect=AssertionError("archive re-read"))
+            with rescan:
+                self.assertFalse(history._check_archive_duplicates(path, [3], "jsonl"))
+
+            history._remember_archive_ids(path, [3], history._stat_key(path))
+            with rescan:
+                self.assertTrue(history._check_archive_duplicates(path, [3], "jsonl"))
+
+    def test_check_archive_duplicates_max_id_watermark(self):
+        from unittest import mock
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = MessageHistory(base_directory=tmpdir, history_format="json")
+            path = os.path.join(history.history_path, "chat_3.jsonl")
+            history.save_batch([_message(1), _message(5)], -3, "T")
+            with mock.patch("utils.history.os.replace", wraps=os.replace) as replace:
+                history.save_batch([_message(8)], -3, "T")
+            # Отметки записываются одним атомарным замещением на пакет
+            self.assertEqual(replace.call_count, 1)
+            self.assertNotIn("archive_meta.json.tmp", os.listdir(history.history_path))
+
+            # Новый запуск: наибольший ID берётся из archive_meta.json, архив не читается
+            restarted = MessageHistory(base_directory=tmpdir, history_format="json")
+            no_read = mock.patch("utils.history.validate_archive_file", side_effect=AssertionError("archive read"))
+            with no_read:
+                self.assertFalse(restarted._check_archive_duplicates(path, [2, 9], "jsonl"))
+            self.assertTrue(restarted._check_archive_duplicates(path, [1, 8], "jsonl"))
+
+            # Архив изменён в обход истории: отметка не используется
+            with open(path, "ab") as f:
+                f.write(b'{"id": 20}\n')
+            self.assertIsNone(restarted._archive_max_id(path))
+            self.assertTrue(restarted._check_archive_duplicates(path, [20], "jsonl"))
+
+            # Ошибка записи отметок не прерывает сохранение и попадает в лог
+            with mock.patch("utils.history.os.replace", side_effect=OSError("read-only")), self.assertLogs(
+                "utils.history", level="WARNING"
+            ):
+                restarted.save_batch([_message(30)], -3, "T")
+            self.assertNotIn("archive_meta.json.tmp", os.listdir(history.history_path))
+
+    def test_build_message_dict_entities(self):
+        from telethon.tl.types import (
+            MessageEntityBold,
+            MessageEntityMentionName,
+            MessageEntityTextUrl,
+        )
+
+        message = _message(
+            1,
+            "bold link name",
+            entities=[
+                MessageEntityBold(offset=0, length=4),
+                MessageEntityTextUrl(offset=5, length=4, url="https://example.com"),
+                MessageEntityMentionName(offset=10, length=4, user_id=42),
+                MessageEntityBold(offset=10, length=4),
+            ],
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = MessageHistory(base_directory=tmpdir, history_format="html")
+            data = history._build_message_dict(message, -1, "T", include_entities=True)
+            self.assertNotIn("entities", history._build_message_dict(message, -1, "T"))
+
+        self.assertEqual(
+            data["entities"],
+            [
+                {"offset": 0, "length": 4, "type": "MessageEntityBold"},
+                {"offset": 5, "length": 4, "type": "MessageEntityTextUrl", "url": "https://example.com"},
+                {"offset": 10, "length": 4, "type": "MessageEntityMentionName", "user_id": 42},
+                {"offset": 10, "length": 4, "type": "MessageEntityBold"},
+            ],
+        )
+
+    def test_chat_records_cache_is_bounded(self):
+        from unittest import mock
+
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch("utils.history._CHAT_RECORDS_CACHE_SIZE", 2):
+            history = MessageHistory(base_directory=tmpdir, history_format="html")
+            for chat in (1, 2, 3):
+                with open(os.path.join(history.history_path, f"chat_{chat}.jsonl"), "w", encoding="utf-8") as f:
+                    f.write(f'{{"id": 1, "text": "t", "chat_id": -{chat}, "chat_title": "T"}}\n')
+            history._generate_chat_html(-1)
+            history._generate_chat_html(-2)
+            history._generate_chat_html(-1)
+            history._generate_chat_html(-3)
+            cached = [os.path.basename(path) for path in history._chat_records]
+        self.assertEqual(cached, ["chat_1.jsonl", "chat_3.jsonl"])
+
+    def test_extract_media_info_document_attributes(self):
+        from telethon.tl.types import (
+            Document,
+            DocumentAttributeAudio,
+            DocumentAttributeFilename,
+            DocumentAttributeVideo,
+            MessageMediaDocument,
+        )
+
+        def make_message(attributes):
+            document = Document(
+                id=1, access_hash=0, file_reference=b"", date=None, mime_type="video/mp4",
+                size=100, dc_id=2, attributes=attributes,
+            )
+            return SimpleNamespace(media=MessageMediaDocument(document=document))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = MessageHistory(base_directory=tmpdir)
+            video = make_message([DocumentAttributeFilename("clip.mp4"), DocumentAttributeVideo(12.5, 640, 480)])
+            info = history._extract_media_info(video)
+            self.assertEqual(info["media_type"], "video")
+            self.assertEqual(
+                (info["file_name"], info["duration"], info["width"], info["height"]), ("clip.mp4", 12.5, 640, 480)
+            )
+
+            note = make_message([DocumentAttributeVideo(3, 240, 240, round_message=True)])
+            self.assertEqual(history._get_media_type(note), "video_note")
+            voice = make_message([DocumentAttributeAudio(7, voice=True)])
+            self.assertEqual(history._extract_media_info(voice)["duration"], 7)
+            self.assertEqual(history._get_media_type(voice), "voice")
+            self.assertEqual(history._get_media_type(make_message([DocumentAttributeFilename("a.pdf")])), "document")
+
+    def _check_jsonl_roundtrip(self, history_module):
+        record = {"id": 5, "text": "привет \"мир\"", "views": None, "duration": 1.5, "entities": [{"type": "Bold"}]}
+        line = history_module._jsonl_line(record)
+        self.assertIsInstance(line, bytes)
+        self.assertTrue(line.endswith(b"\n"))
+        self.assertEqual(json.loads(line.decode("utf-8")), record)
+        self.assertEqual(history_module._json_loads(line.strip()), record)
+        # Целые числа больше 64 бит (orjson их не поддерживает) обрабатываются стандартным json
+        big = history_module._jsonl_line({"id": 2**70})
+        self.assertEqual(big, b'{"id": 1180591620717411303424}\n')
+        self.assertEqual(history_module._json_loads(big.strip()), {"id": 2**70})
+        with self.assertRaises(ValueError):
+            history_module._json_loads(b'{"id": ')
+        return line
+
+    @unittest.skipIf(orjson is None, "orjson не установлен")
+    def test_jsonl_orjson_path(self):
+        from unittest import mock
+
+        from utils import history as history_module
+
+        with mock.patch.object(orjson, "dumps", wraps=orjson.dumps) as dumps, mock.patch.object(
+            orjson, "loads", wraps=orjson.loads
+        ) as loads:
+            self._check_jsonl_roundtrip(history_module)
+        self.assertTrue(dumps.called)
+        self.assertTrue(loads.called)
+
+    def test_jsonl_stdlib_path(self):
+        from unittest import mock
+
+        from utils import history as history_module
+
+        with mock.patch.object(history_module, "orjson", None):
+            line = self._check_jsonl_roundtrip(history_module)
+        self.assertEqual(line, (json.dumps(json.loads(line), ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def test_generate_chat_html_reuses_parsed_records(self):
+        from unittest import mock
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = MessageHistory(base_directory=tmpdir, history_format="html")
+            history.save_batch([_message(1, "первое")], -9, "T")
+            html_path = os.path.join(history.history_path, "chat_9.html")
+            with mock.patch("utils.history._json_loads", side_effect=AssertionError("archive re-read")):
+                history.save_batch([_message(2, "второе")], -9, "T")
+            with open(html_path, encoding="utf-8") as f:
+                content = f.read()
+            self.assertIn("первое", content)
+            self.assertIn("второе", content)
+
+            # Архив изменён в обход MessageHistory: кэш не используется
+            with open(os.path.join(history.history_path, "chat_9.jsonl"), "ab") as f:
+                f.write(b'{"id": 3, "text": "third", "chat_id": -9, "chat_title": "T"}\n')
+            history._generate_chat_html(-9)
+            with open(html_path, encoding="utf-8") as f:
+                self.assertIn("third", f.read())
@@ -3,15 +3,29 @@
 from __future__ import annotations
 
 import asyncio
+import locale
 import logging
 import sys
 import textwrap
 import time
 import unicodedata
-import locale
-from collections import OrderedDict
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from collections import Counter, OrderedDict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from rich.console import Console
 from rich.prompt import Confirm, IntPrompt, Prompt
@@ -21,8 +35,136 @@ from telethon.tl.types import Chat, User
 
 from utils.i18n import get_i18n
 
+# slots=True поддерживается dataclass только начиная с Python 3.10
+_DATACLASS_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# Иконки типов чатов в TUI
+_TYPE_LABELS: Dict[str, str] = {"user": "👤", "group": "👥", "channel": "📢"}
+# Подписи типов чатов в таблице классического выбора
+_TYPE_NAMES_RU: Dict[str, str] = {
+    "user": "👤 Пользователь",
+    "group": "👥 Группа",
+    "channel": "📢 Канал",
+}
+# Отметки позиции в очереди: _MARKS[0] — не выбран, _MARKS[1..99] — номер в очереди
+_MARKS: Tuple[str, ...] = ("[  ]",) + tuple(f"[{i:02d}]" for i in range(1, 100))
+_MARK_OVERFLOW = "[**]"
+# Перевод строки, возврат каретки и табуляция в превью -> пробел (за один проход)
+_WS_TRANS = str.maketrans({"\n": " ", "\r": " ", "\t": " "})
+# Числовые типы значений конфига TUI
+_NUM_TYPES = (int, float)
+
+
+def _search_key(text: str) -> str:
+    """Привести строку к виду для поиска без учёта регистра (NFKC + casefold)."""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+# Переключение режима фильтра по клавише (текущий -> следующий)
+_FILTER_CYCLE: Dict[str, str] = {
+    "all": "groups_channels",
+    "groups_channels": "channels",
+    "channels": "groups",
+    "groups": "users",
+    "users": "all",
+}
+# Типы чатов, проходящие фильтр TUI (режим "all" и неизвестные режимы не фильтруют)
+_FILTER_MODE_TYPES: Dict[str, FrozenSet[str]] = {
+    "groups_channels": frozenset(("group", "channel")),
+    "channels": frozenset(("channel",)),
+    "groups": frozenset(("group",)),
+    "users": frozenset(("user",)),
+}
+
+
+class _TuiStreamCapture:  # pylint: disable=too-few-public-methods
+    """Поток-заглушка для stdout/stderr: пишет всё в файл и никогда не падает."""
+
+    def __init__(self, file_obj):  # noqa: ANN001
+        self._f = file_obj
+
+    def write(self, s: Any) -> int:
+        try:
+            text = s if isinstance(s, str) else str(s)
+        except Exception:
+            text = "<unprintable>"
+        try:
+            self._f.write(text)
+            self._f.flush()
+        except Exception:
+            # Ничего не делаем: нельзя падать из-за логов
+            return 0
+        return len(text)
+
+    def flush(self) -> None:
+        try:
+            self._f.flush()
+        except Exception:
+            pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+@contextmanager
+def _capture_output_to_file(log_path: str) -> Iterator[None]:
+    """
+    Перехватить stdout/stderr и логирование в файл на время работы curses.
+
+    Любые выводы в stdout/stderr или StreamHandler'ы логгера во время curses
+    могут "сломать" экран (пропадает заголовок/подвал, всё плывёт). Поэтому
+    вывод уходит в файл, а обработчики корневого логгера, пишущие в терминал,
+    временно снимаются; отладочная информация при этом не теряется.
+
+    Parameters
+    ----------
+    log_path: str
+        Путь к файлу для перехваченного вывода и логов.
+    """
+    root_logger = logging.getLogger()
+    saved_handlers = list(root_logger.handlers)
+    saved_root_level = root_logger.level
+    saved_stdout = sys.stdout
+    saved_stderr = sys.stderr
+    with ExitStack() as stack:
+        try:
+            log_file = stack.enter_context(
+                open(log_path, "a", encoding="utf-8")  # noqa: PTH123
+            )
+            file_handler = logging.FileHandler(log_path, encoding="utf-8")
+            stack.callback(file_handler.close)
+            file_handler.setLevel(logging.DEBUG)
+            file_handler.setFormatter(
+                logging.Formatter(
+                    "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S",
+                )
+            )
+            sys.stdout = _TuiStreamCapture(log_file)  # type: ignore[assignment]
+            sys.stderr = _TuiStreamCapture(log_file)  # type: ignore[assignment]
+            # Убрать вывод в терминал (RichHandler/StreamHandler), оставив файл.
+            # Список handlers заменяется по срезу, его identity сохраняется.
+            root_logger.handlers[:] = [
+                h for h in saved_handlers if not isinstance(h, logging.StreamHandler)
+            ] + [file_handler]
+            if root_logger.level > logging.DEBUG:
+                root_logger.setLevel(logging.DEBUG)
+        except Exception:
+            # Если что-то пошло не так — лучше продолжить TUI без перехвата,
+            # чем падать на этапе выбора чатов.
+            sys.stdout = saved_stdout
+            sys.stderr = saved_stderr
+            root_logger.handlers[:] = saved_handlers
+        try:
+            yield
+        finally:
+            sys.stdout = saved_stdout
+            sys.stderr = saved_stderr
+            root_logger.handlers[:] = saved_handlers
+            root_logger.setLevel(saved_root_level)
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class ChatListItem:
     """Элемент списка чатов для выбора."""
 
@@ -30,6 +172,11 @@ class ChatListItem:
     title: str
     chat_type: str
     last_message_preview: str = ""
+    # Название в нормализованном виде для поиска, вычисляется один раз при создании
+    title_search: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "title_search", _search_key(self.title or ""))
 
 
 class ChatSelector:
@@ -62,8 +209,13 @@ class ChatSelector:
             "label_single": "Последнее сообщение:",
             "label_multi": "Последние сообщения:",
             "include_media_placeholder": True,
-            # Частота опроса клавиатуры/обновления (мс)
+            # Минимальный интервал между перерисовками при быстром вводе (мс);
+            # также частота опроса клавиатуры, если ожидание ввода через
+            # event loop недоступно
             "poll_interval_ms": 33,
+            # Максимальное время ожидания ввода в простое (мс): проверка
+            # ресайза/TTL кэша превью
+            "idle_timeout_ms": 200,
         },
         "colors": {
             # Цвета: black, red, green, yellow, blue, magenta, cyan, white, default
@@ -121,7 +273,7 @@ class ChatSelector:
         self,
         client: TelegramClient,
         language: str = "ru",
-        tui_config: Optional[Dict[str, Any]] = None,
+        tui_config: Optional[Mapping[str, Any]] = None,
     ):
         """
         Инициализация ChatSelector.
@@ -132,14 +284,17 @@ class ChatSelector:
             Клиент Telethon.
         language: str
             Язык интерфейса.
-        tui_config: Optional[Dict[str, Any]]
-            Настройки TUI из конфигурации (секция `tui`).
+        tui_config: Optional[Mapping[str, Any]]
+            Настройки TUI из конфигурации (секция `tui`), только для чтения.
         """
         self.client = client
         self.i18n = get_i18n(language)
         self.console = Console()
         self.page_size = 50  # Количество чатов на странице
-        self._tui_config_raw: Dict[str, Any] = tui_config or {}
+        self._tui_config_raw: Mapping[str, Any] = tui_config or {}
+        # Ключи поиска по названиям чатов (NFKC + casefold) по chat_id: считаются
+        # один раз при получении списка, а не на каждый поисковый запрос
+        self._title_search_keys: Dict[int, str] = {}
 
     def _get_tui_config(self) -> Dict[str, Any]:
         """
@@ -159,10 +314,10 @@ class ChatSelector:
             "keys": dict(self._DEFAULT_TUI_CONFIG["keys"]),
         }
         raw = self._tui_config_raw
-        if isinstance(raw, dict):
+        if isinstance(raw, Mapping):
             for section in ("display", "preview", "colors", "layout", "text", "keys"):
                 val = raw.get(section)
-                if isinstance(val, dict):
+                if isinstance(val, Mapping):
                     cfg[section].update(val)
         return cfg
 
@@ -190,6 +345,7 @@ class ChatSelector:
                 chat_type = "channel"
 
             chats.append((chat_id, title, chat_type))
+            self._title_search_keys[chat_id] = _search_key(title or "")
         return chats
 
     async def get_available_chat_items(self) -> List[ChatListItem]:
@@ -224,7 +380,7 @@ class ChatSelector:
             if last_msg is not None:
                 text = getattr(last_msg, "message", None)
                 if isinstance(text, str):
-                    preview = text.replace("\n", " ").strip()
+                    preview = text.translate(_WS_TRANS).strip()
                 if not preview and getattr(last_msg, "media", None) is not None:
                     preview = "<media>"
 
@@ -259,40 +415,44 @@ class ChatSelector:
             - "groups": только группы
             - "users": только пользователи
         search_query: str
-            Поисковый запрос по названию чата (подстрока, без регистра).
+            Поисковый запрос по названию чата (подстрока, без регистра). Если
+            в запросе несколько слов, чат подходит, когда каждое слово найдено
+            в названии или chat_id.
 
         Returns
         -------
         List[ChatListItem]
             Отфильтрованный список.
         """
-        filtered: List[ChatListItem] = list(items)
-
-        if filter_mode == "groups_channels":
-            filtered = [i for i in filtered if i.chat_type in ("group", "channel")]
-        elif filter_mode == "channels":
-            filtered = [i for i in filtered if i.chat_type == "channel"]
-        elif filter_mode == "groups":
-            filtered = [i for i in filtered if i.chat_type == "group"]
-        elif filter_mode == "users":
-            filtered = [i for i in filtered if i.chat_type == "user"]
-
-        q = (search_query or "").strip().lower()
-        if q:
-            filtered = [
-                i
-                for i in filtered
-                if q in (i.title or "").lower()
-                or q in str(i.chat_id)
-            ]
-
-        return filtered
+        allowed_types = _FILTER_MODE_TYPES.get(filter_mode)
+        tokens = _search_key(search_query or "").split()
+        if not tokens:
+            if allowed_types is None:
+                return list(items)
+            return [i for i in items if i.chat_type in allowed_types]
+
+        # Тип и поиск проверяются за один проход по списку
+        q = tokens[0]
+        multi = len(tokens) > 1
+        matched: List[ChatListItem] = []
+        for i in items:
+            if allowed_types is not None and i.chat_type not in allowed_types:
+                continue
+            title_search = i.title_search
+            if multi:
+                chat_id_str = str(i.chat_id)
+                if all(t in title_search or t in chat_id_str for t in tokens):
+                    matched.append(i)
+            elif q in title_search or q in str(i.chat_id):
+                matched.append(i)
+        return matched
 
     def filter_chats(
         self,
         chats: List[Tuple[int, str, str]],
         chat_type: Optional[str] = None,
-        search_query: Optional[str] = None
+        search_query: Optional[str] = None,
+        chat_types: Optional[Iterable[str]] = None,
     ) -> List[Tuple[int, str, str]]:
         """
         Фильтровать чаты по типу и поисковому запросу.
@@ -305,30 +465,69 @@ class ChatSelector:
             Тип чата для фильтрации ('user', 'group', 'channel', None - все).
         search_query: Optional[str]
             Поисковый запрос по названию.
+        chat_types: Optional[Iterable[str]]
+            Несколько допустимых типов сразу (например, группы и каналы).
+            Если задан, используется вместо chat_type.
 
         Returns
         -------
         List[Tuple[int, str, str]]
             Отфильтрованный список чатов.
         """
-        filtered = chats
+        allowed_types: Optional[FrozenSet[str]] = None
+        if chat_types is not None:
+            allowed_types = frozenset(chat_types)
+        elif chat_type:
+            allowed_types = frozenset((chat_type,))
+
+        if not search_query:
+            if allowed_types is None:
+                return chats
+            return [c for c in chats if c[2] in allowed_types]
+
+        # Тип (дешёвая проверка) и поиск по названию за один проход;
+        # ключи поиска по названиям берутся из кэша
+        query_key = _search_key(search_query)
+        title_keys = self._title_search_keys
+        matched: List[Tuple[int, str, str]] = []
+        for c in chats:
+            if allowed_types is not None and c[2] not in allowed_types:
+                continue
+            title_key = title_keys.get(c[0])
+            if title_key is None:
+                title_key = title_keys[c[0]] = _search_key(c[1] or "")
+            if query_key in title_key:
+                matched.append(c)
+        return matched
 
-        # Фильтр по типу
-        if chat_type:
-            filtered = [c for c in filtered if c[2] == chat_type]
+    @staticmethod
+    def chat_type_stats(chats: Sequence[Tuple[int, str, str]]) -> Dict[str, int]:
+        """
+        Посчитать количество чатов каждого типа.
 
-        # Поиск по названию
-        if search_query:
-            query_lower = search_query.lower()
-            filtered = [c for c in filtered if query_lower in c[1].lower()]
+        Parameters
+        ----------
+        chats: Sequence[Tuple[int, str, str]]
+            Список чатов (chat_id, title, type).
 
-        return filtered
+        Returns
+        -------
+        Dict[str, int]
+            Количество чатов по типам: "user", "group", "channel".
+        """
+        counts = Counter(c[2] for c in chats)
+        return {
+            "user": counts["user"],
+            "group": counts["group"],
+            "channel": counts["channel"],
+        }
 
     def display_chats(
         self,
         chats: List[Tuple[int, str, str]],
         page: int = 1,
-        show_stats: bool = True
+        show_stats: bool = True,
+        stats: Optional[Dict[str, int]] = None,
     ) -> int:
         """
         Отобразить список чатов в виде таблицы с пагинацией.
@@ -341,6 +540,9 @@ class ChatSelector:
             Номер страницы для отображения.
         show_stats: bool
             Показывать ли статистику по типам чатов.
+        stats: Optional[Dict[str, int]]
+            Заранее посчитанная статистика (см. chat_type_stats). Позволяет при
+            листании страниц не проходить весь список заново.
 
         Returns
         -------
@@ -350,13 +552,14 @@ class ChatSelector:
         total_pages = (len(chats) - 1) // self.page_size + 1 if chats else 0
         start_idx = (page - 1) * self.page_size
         end_idx = min(start_idx + self.page_size, len(chats))
-        page_chats = chats[start_idx:end_idx]
 
         if show_stats:
             # Статистика по типам
-            users = sum(1 for c in chats if c[2] == "user")
-            groups = sum(1 for c in chats if c[2] == "group")
-            channels = sum(1 for c in chats if c[2] == "channel")
+            if stats is None:
+                stats = self.chat_type_stats(chats)
+            users = stats.get("user", 0)
+            groups = stats.get("group", 0)
+            channels = stats.get("channel", 0)
 
             self.console.print(f"\n[bold cyan]Статистика:[/bold cyan]")
             self.console.print(f"  Всего: {len(chats)} | Пользователи: {users} | Группы: {groups} | Каналы: {channels}")
@@ -368,13 +571,11 @@ class ChatSelector:
         table.add_column("Тип", style="green")
         table.add_column("ID", style="yellow")
 
-        for idx, (chat_id, title_text, chat_type) in enumerate(page_chats, start_idx + 1):
-            type_ru = {
-                "user": "👤 Пользователь",
-                "group": "👥 Группа",
-                "channel": "📢 Канал"
-            }.get(chat_type, chat_type)
-            table.add_row(str(idx), title_text[:50], type_ru, str(chat_id))
+        # Строки страницы берём по индексам, без копии среза списка
+        for idx in range(start_idx, end_idx):
+            chat_id, title_text, chat_type = chats[idx]
+            type_ru = _TYPE_NAMES_RU.get(chat_type, chat_type)
+            table.add_row(str(idx + 1), title_text[:50], type_ru, str(chat_id))
 
         self.console.print(table)
         return total_pages
@@ -413,8 +614,7 @@ class ChatSelector:
 
         filtered_chats = chats
         if filter_choice == "2":
-            filtered_chats = self.filter_chats(chats, chat_type="group") + \
-                           self.filter_chats(chats, chat_type="channel")
+            filtered_chats = self.filter_chats(chats, chat_types=("group", "channel"))
             self.console.print(f"[green]Отфильтровано: {len(filtered_chats)} чатов (группы + каналы)[/green]")
         elif filter_choice == "3":
             filtered_chats = self.filter_chats(chats, chat_type="channel")
@@ -434,12 +634,16 @@ class ChatSelector:
             self.console.print("[yellow]После фильтрации чатов не осталось[/yellow]")
             return []
 
-        # Пагинация
+        # Пагинация. Статистику считаем один раз на отфильтрованный список,
+        # а не при каждом переходе по страницам.
         current_page = 1
         selected_chats = []
+        # chat_id уже выбранных чатов — проверка "уже выбран" за O(1)
+        selected_ids: Set[int] = set()
+        stats = self.chat_type_stats(filtered_chats)
 
         while True:
-            total_pages = self.display_chats(filtered_chats, current_page)
+            total_pages = self.display_chats(filtered_chats, current_page, stats=stats)
 
             self.console.print("\n[bold]Команды:[/bold]")
             self.console.print("  - Номера через запятую (например: 1,3,5) - выбрать чаты")
@@ -485,6 +689,7 @@ class ChatSelector:
                 search_query = Prompt.ask("Введите поисковый запрос")
                 filtered_chats = self.filter_chats(chats, search_query=search_query)
                 self.console.print(f"[green]Найдено: {len(filtered_chats)} чатов[/green]")
+                stats = self.chat_type_stats(filtered_chats)
                 current_page = 1
             elif choice == "filter":
                 # Рекурсивный вызов для нового выбора фильтра
@@ -494,7 +699,8 @@ class ChatSelector:
                     indices = [int(x.strip()) - 1 for x in choice.split(",")]
                     for idx in indices:
                         if 0 <= idx < len(filtered_chats):
-                            if filtered_chats[idx] not in selected_chats:
+                            if filtered_chats[idx][0] not in selected_ids:
+                                selected_ids.add(filtered_chats[idx][0])
                                 selected_chats.append(filtered_chats[idx])
                                 self.console.print(
                                     f"[green]✓ Выбран: {filtered_chats[idx][1]}[/green]"
@@ -558,71 +764,6 @@ class ChatSelector:
         keys_cfg = tui_cfg.get("keys", {})
         show_chat_id = display_cfg.get("show_chat_id", True) is True
 
-        # Важно: любые выводы в stdout/stderr или StreamHandler'ы логгера во время curses
-        # могут "сломать" экран (пропадает заголовок/подвал, всё плывёт).
-        # Поэтому на время TUI перехватываем вывод в файл и отключаем вывод в терминал,
-        # не теряя при этом отладочную информацию.
-        class _TuiStreamCapture:  # pylint: disable=too-few-public-methods
-            def __init__(self, file_obj):  # noqa: ANN001
-                self._f = file_obj
-
-            def write(self, s: Any) -> int:
-                try:
-                    text = s if isinstance(s, str) else str(s)
-                except Exception:
-                    text = "<unprintable>"
-                try:
-                    self._f.write(text)
-                    self._f.flush()
-                except Exception:
-                    # Ничего не делаем: нельзя падать из-за логов
-                    return 0
-                return len(text)
-
-            def flush(self) -> None:
-                try:
-                    self._f.flush()
-                except Exception:
-                    pass
-
-            def isatty(self) -> bool:
-                return False
-
-        log_path = "tui-debug.log"
-        root_logger = logging.getLogger()
-        saved_handlers = list(root_logger.handlers)
-        saved_root_level = root_logger.level
-        saved_stdout = sys.stdout
-        saved_stderr = sys.stderr
-        tui_log_file = None
-        tui_file_handler: Optional[logging.Handler] = None
-        try:
-            tui_log_file = open(log_path, "a", encoding="utf-8")  # noqa: PTH123
-            sys.stdout = _TuiStreamCapture(tui_log_file)  # type: ignore[assignment]
-            sys.stderr = _TuiStreamCapture(tui_log_file)  # type: ignore[assignment]
-
-            # Убрать вывод в терминал (RichHandler/StreamHandler), оставив файл.
-            for h in list(root_logger.handlers):
-                if isinstance(h, logging.StreamHandler):
-                    root_logger.removeHandler(h)
-
-            tui_file_handler = logging.FileHandler(log_path, encoding="utf-8")
-            tui_file_handler.setLevel(logging.DEBUG)
-            tui_file_handler.setFormatter(
-                logging.Formatter(
-                    "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-                    datefmt="%Y-%m-%d %H:%M:%S",
-                )
-            )
-            root_logger.addHandler(tui_file_handler)
-            if root_logger.level > logging.DEBUG:
-                root_logger.setLevel(logging.DEBUG)
-        except Exception:
-            # Если что-то пошло не так — лучше продолжить TUI без перехвата,
-            # чем падать на этапе выбора чатов.
-            tui_log_file = None
-            tui_file_handler = None
-
         selected: Set[int] = set(preselected_chat_ids or set())
         # Порядок очереди: сохраняем как список chat_id
         selected_order: List[int] = []
@@ -635,28 +776,33 @@ class ChatSelector:
             for it0 in items:
                 if it0.chat_id in selected and it0.chat_id not in selected_order:
                     selected_order.append(it0.chat_id)
+        # Позиция в очереди (1-based); обновляется точечно при изменении selected_order
+        selected_pos: Dict[int, int] = {
+            cid: idx_o for idx_o, cid in enumerate(selected_order, 1)
+        }
 
         show_selected_only = False
         by_id: Dict[int, ChatListItem] = {i.chat_id: i for i in items}
 
         def _visible_items() -> List[ChatListItem]:
             if show_selected_only:
-                out: List[ChatListItem] = []
-                for cid in selected_order:
-                    if cid not in selected:
-                        continue
-                    it = by_id.get(cid)
-                    if it is not None:
-                        out.append(it)
-                return out
-            return self.filter_chat_items(items, filter_mode=filter_mode, search_query=search_query)
+                return [
+                    by_id[cid]
+                    for cid in selected_order
+                    if cid in selected and cid in by_id
+                ]
+            return self.filter_chat_items(
+                items,
+                filter_mode=filter_mode,
+                search_query=search_query,
+            )
         filter_mode = "all"
         search_query = ""
         index = 0
         offset = 0
 
         def _type_label(t: str) -> str:
-            return {"user": "👤", "group": "👥", "channel": "📢"}.get(t, "?")
+            return _TYPE_LABELS.get(t, "?")
 
         def _filter_label(mode: str) -> str:
             return {
@@ -771,20 +917,23 @@ class ChatSelector:
             if width <= 1:
                 return ""
 
-            if _wcswidth(s) <= width:
-                return s
-
             ell = "…"
-            target = max(0, width - 1)
-            out: List[str] = []
+            # Быстрый путь: печатный ASCII — ровно одна колонка на символ
+            if s.isascii() and s.isprintable():
+                return s if len(s) <= width else s[: width - 1] + ell
+
+            # Один проход: запоминаем место обрезки под многоточие и выходим,
+            # как только строка заведомо не помещается в width.
+            target = width - 1
             cur = 0
-            for ch in s:
-                w = _ch_width(ch)
-                if cur + w > target:
-                    break
-                out.append(ch)
-                cur += w
-            return "".join(out) + ell
+            cut = -1
+            for pos, ch in enumerate(s):
+                cur += _ch_width(ch)
+                if cut < 0 and cur > target:
+                    cut = pos
+                if cur > width:
+                    return s[:cut] + ell
+            return s
 
         def _addstr_safe(stdscr, y: int, x: int, s: str, max_cols: int, attr: int = 0) -> None:  # noqa: ANN001
             """
@@ -798,6 +947,14 @@ class ChatSelector:
                 # curses.error и любые проблемы рендера не должны падать
                 return
 
+        def _clear_to_eol(stdscr, y: int, x: int) -> None:  # noqa: ANN001
+            """Очистить строку экрана от колонки x до конца."""
+            try:
+                stdscr.move(y, x)
+                stdscr.clrtoeol()
+            except Exception:
+                pass
+
         def _as_int(v: Any, default: int, *, min_value: int = 0, max_value: Optional[int] = None) -> int:
             try:
                 iv = int(v)
@@ -810,9 +967,9 @@ class ChatSelector:
             return iv
 
         def _as_bool(v: Any, default: bool) -> bool:
-            if isinstance(v, bool):
-                return v
-            if isinstance(v, (int, float)):
+            # Быстрый путь — точная проверка типа для bool/int/float
+            tv = type(v)
+            if tv is bool or tv in _NUM_TYPES:
                 return bool(v)
             if isinstance(v, str):
                 s = v.strip().lower()
@@ -820,11 +977,15 @@ class ChatSelector:
                     return True
                 if s in ("0", "false", "no", "n", "off"):
                     return False
+                return default
+            # Подклассы чисел (например, IntEnum) — после строк, самого частого случая
+            if isinstance(v, _NUM_TYPES):
+                return bool(v)
             return default
 
         def _normalize_message_text(text: Any, has_media: bool, include_media_placeholder: bool) -> str:
             if isinstance(text, str):
-                t = text.replace("\n", " ").strip()
+                t = text.translate(_WS_TRANS).strip()
                 if t:
                     return t
             if has_media and include_media_placeholder:
@@ -855,6 +1016,15 @@ class ChatSelector:
         label_single = str(preview_cfg.get("label_single", "Последнее сообщение:"))
         label_multi = str(preview_cfg.get("label_multi", "Последние сообщения:"))
         poll_interval_s = _as_int(preview_cfg.get("poll_interval_ms", 33), 33, min_value=1, max_value=1000) / 1000.0
+        idle_timeout_s = (
+            _as_int(
+                preview_cfg.get("idle_timeout_ms", 200),
+                200,
+                min_value=1,
+                max_value=10_000,
+            )
+            / 1000.0
+        )
 
         def _prompt_input(stdscr, prompt: str, initial: str = "") -> str:  # noqa: ANN001
             """
@@ -884,8 +1054,12 @@ class ChatSelector:
                 except Exception:
                     pass
 
-                # Буфер редактирования
-                buf = list(initial or "")
+                # get_wch() есть не во всех сборках curses — фолбэк на getch
+                # выбираем один раз
+                read_key = getattr(stdscr, "get_wch", None) or stdscr.getch
+
+                # Буфер редактирования (строка; меняется срезами только при правке)
+                buf = initial or ""
                 cursor_pos = len(buf)
 
                 while True:
@@ -895,7 +1069,7 @@ class ChatSelector:
                     stdscr.addstr(y, 0, _truncate(prompt_s, max(0, width - 1)))
                     
                     # Показываем текст с учётом ширины
-                    visible_text = "".join(buf)[: max(0, edit_w - 1)]
+                    visible_text = buf[: max(0, edit_w - 1)]
                     try:
                         stdscr.addstr(y, x0, visible_text)
                     except Exception:
@@ -911,16 +1085,11 @@ class ChatSelector:
 
                     # Читаем символ (get_wch поддерживает UTF-8)
                     try:
-                        ch = stdscr.get_wch()
-                    except Exception:
-                        # Фолбэк на getch при ошибках
-                        try:
-                            ch_code = stdscr.getch()
-                            if ch_code == -1:
-                                continue
-                            ch = ch_code
-                        except Exception:
-                            continue
+                        ch = read_key()
+                    except curses.error:
+                        continue
+                    if ch == -1:
+                        continue
 
                     # Обработка специальных клавиш
                     if isinstance(ch, int):
@@ -931,11 +1100,11 @@ class ChatSelector:
                             return initial
                         elif ch in (curses.KEY_BACKSPACE, 127, 8):  # Backspace
                             if cursor_pos > 0:
-                                buf.pop(cursor_pos - 1)
+                                buf = buf[: cursor_pos - 1] + buf[cursor_pos:]
                                 cursor_pos -= 1
                         elif ch == curses.KEY_DC:  # Delete
                             if cursor_pos < len(buf):
-                                buf.pop(cursor_pos)
+                                buf = buf[:cursor_pos] + buf[cursor_pos + 1 :]
                         elif ch == curses.KEY_LEFT:
                             cursor_pos = max(0, cursor_pos - 1)
                         elif ch == curses.KEY_RIGHT:
@@ -952,10 +1121,10 @@ class ChatSelector:
                             return initial
                         # Обычный символ (включая UTF-8 многобайтовые)
                         elif ch.isprintable():
-                            buf.insert(cursor_pos, ch)
+                            buf = buf[:cursor_pos] + ch + buf[cursor_pos:]
                             cursor_pos += 1
 
-                return "".join(buf).strip()
+                return buf.strip()
 
             finally:
                 try:
@@ -1038,7 +1207,7 @@ class ChatSelector:
                 out.add(curses.KEY_END)
             return out
 
-        keymap = {
+        keymap_raw = {
             "quit": _parse_key_spec(keys_cfg.get("quit", self._DEFAULT_TUI_CONFIG["keys"]["quit"])),
             "confirm": _parse_key_spec(keys_cfg.get("confirm", self._DEFAULT_TUI_CONFIG["keys"]["confirm"])),
             "toggle": _parse_key_spec(keys_cfg.get("toggle", self._DEFAULT_TUI_CONFIG["keys"]["toggle"])),
@@ -1055,6 +1224,52 @@ class ChatSelector:
             "move_up": _parse_key_spec(keys_cfg.get("move_up", self._DEFAULT_TUI_CONFIG["keys"]["move_up"])),
             "move_down": _parse_key_spec(keys_cfg.get("move_down", self._DEFAULT_TUI_CONFIG["keys"]["move_down"])),
         }
+        # После разбора конфига раскладка не меняется — фиксируем её как неизменяемую
+        keymap: Mapping[str, FrozenSet[int]] = MappingProxyType(
+            {action_name: frozenset(codes) for action_name, codes in keymap_raw.items()}
+        )
+        # Обратный индекс keycode -> action: одна проверка в dict на нажатие вместо
+        # каскада `key in keymap[...]`. При коллизиях приоритет у действий,
+        # которые раньше стоят в этом списке (как в прежней цепочке if/elif).
+        key_to_action: Dict[int, str] = {}
+        for action_name in (
+            "quit",
+            "confirm",
+            "show_selected",
+            "toggle",
+            "move_up",
+            "move_down",
+            "clear",
+            "search",
+            "filter",
+            "up",
+            "down",
+            "page_up",
+            "page_down",
+            "home",
+            "end",
+        ):
+            for code in keymap[action_name]:
+                key_to_action.setdefault(code, action_name)
+
+        # Тексты и раскладка не меняются за время сессии — резолвим один раз до цикла
+        header_text = str(
+            text_cfg.get("header", self._DEFAULT_TUI_CONFIG["text"]["header"])
+        )
+        no_chats_text = str(
+            text_cfg.get("no_chats", self._DEFAULT_TUI_CONFIG["text"]["no_chats"])
+        )
+        no_selected_text = str(
+            text_cfg.get("no_selected", self._DEFAULT_TUI_CONFIG["text"]["no_selected"])
+        )
+        search_prompt_text = str(
+            text_cfg.get(
+                "search_prompt", self._DEFAULT_TUI_CONFIG["text"]["search_prompt"]
+            )
+        )
+        list_min_width = int(layout_cfg.get("list_min_width", 30))
+        list_width_ratio = float(layout_cfg.get("list_width_ratio", 0.5))
+        preview_min_width = int(layout_cfg.get("preview_min_width", 10))
 
         async def _fetch_preview(chat_id: int, limit: int) -> List[str]:
             msgs = await self.client.get_messages(chat_id, limit=limit)
@@ -1069,13 +1284,137 @@ class ChatSelector:
 
         # LRU cache: chat_id -> (ts, [messages...])
         preview_cache: "OrderedDict[int, Tuple[float, List[str]]]" = OrderedDict()
+        # LRU cache готовых строк превью:
+        # (chat_id, preview_w, wrap) -> (ts записи preview_cache, [строки...]).
+        # ts служит версией: при новой загрузке превью запись считается устаревшей.
+        # Для last_message_preview из списка диалогов версия — None (текст
+        # не меняется за сессию).
+        wrap_cache: (
+            "OrderedDict[Tuple[int, int, bool], Tuple[Optional[float], List[str]]]"
+        ) = OrderedDict()
+
+        def _lru_put(cache: "OrderedDict[Any, Any]", key: Any, value: Any) -> None:
+            cache[key] = value
+            cache.move_to_end(key)
+            if cache_size > 0:
+                while len(cache) > cache_size:
+                    cache.popitem(last=False)
+
+        def _fresh_preview(chat_id: int, now: float) -> Optional[Tuple[float, List[str]]]:
+            """Вернуть запись кэша превью, если она есть, не протухла и не пуста."""
+            cached = preview_cache.get(chat_id)
+            if cached is None or not cached[1]:
+                return None
+            if 0 < cache_ttl_s < now - cached[0]:
+                return None
+            # Попадание поднимает запись в конец: вытесняются давно не просмотренные чаты
+            preview_cache.move_to_end(chat_id)
+            return cached
+
+        def _wrapped_last_message(it: ChatListItem, preview_w: int) -> List[str]:
+            """Строки превью из last_message_preview (без сети), с кэшем по ширине."""
+            wrap_key = (it.chat_id, preview_w, wrap_enabled)
+            wrapped_entry = wrap_cache.get(wrap_key)
+            if wrapped_entry is not None and wrapped_entry[0] is None:
+                wrap_cache.move_to_end(wrap_key)
+                return wrapped_entry[1]
+            text = it.last_message_preview or "<пусто>"
+            if wrap_enabled:
+                lines = _wrap_lines(text, max(0, preview_w - 2))
+            else:
+                lines = [_truncate(text, max(0, preview_w - 2))]
+            _lru_put(wrap_cache, wrap_key, (None, lines))
+            return lines
+
+        def _wrapped_fetched_messages(
+            chat_id: int, preview_w: int, cached: Tuple[float, List[str]]
+        ) -> List[str]:
+            """Пронумерованные строки загруженных превью, с кэшем по ширине."""
+            wrap_key = (chat_id, preview_w, wrap_enabled)
+            wrapped_entry = wrap_cache.get(wrap_key)
+            if wrapped_entry is not None and wrapped_entry[0] == cached[0]:
+                wrap_cache.move_to_end(wrap_key)
+                return wrapped_entry[1]
+            lines: List[str] = []
+            for idx_m, msg in enumerate(cached[1][:preview_messages_count], 1):
+                prefix = f"{idx_m}. "
+                text_w = max(0, (preview_w - 2) - len(prefix))
+                if wrap_enabled:
+                    for j, wl in enumerate(_wrap_lines(msg, text_w)):
+                        lines.append((prefix if j == 0 else " " * len(prefix)) + wl)
+                else:
+                    lines.append(prefix + _truncate(msg, text_w))
+                if len(lines) >= max_preview_lines:
+                    break
+            _lru_put(wrap_cache, wrap_key, (cached[0], lines))
+            return lines
+
+        def _preview_info_lines(cur: ChatListItem, preview_w: int) -> List[str]:
+            """Собрать строки правой панели (заголовок, метка, превью) без отрисовки."""
+            header_lines: List[str] = [f"{_type_label(cur.chat_type)} {cur.title}"]
+            if show_chat_id:
+                header_lines.append(f"chat_id: {cur.chat_id}")
+
+            # Получить тело превью
+            body_lines: List[str] = []
+            if preview_messages_count <= 1 or fetch_mode == "off":
+                label = label_single
+                body_lines = _wrapped_last_message(cur, preview_w)
+            else:
+                label = label_multi
+                cached = _fresh_preview(cur.chat_id, time.monotonic())
+                if cached is not None:
+                    body_lines = _wrapped_fetched_messages(cur.chat_id, preview_w, cached)
+                elif show_loading and inflight is not None and inflight_chat_id == cur.chat_id:
+                    body_lines = [loading_text]
+                elif last_fetch_error and last_fetch_error_chat_id == cur.chat_id:
+                    body_lines = [_truncate(last_fetch_error, max(0, preview_w - 2))]
+                else:
+                    # Фолбэк (без сети пока нет данных)
+                    body_lines = _wrapped_last_message(cur, preview_w)
+
+            # Собрать, ограничив высоту
+            info_lines: List[str] = []
+            info_lines.extend(header_lines)
+            info_lines.append("")
+            info_lines.append(label)
+            if not body_lines:
+                body_lines = ["<пусто>"]
+            if wrap_enabled:
+                info_lines.extend(body_lines[:max_preview_lines])
+            else:
+                info_lines.extend([_truncate(x, max(0, preview_w - 2)) for x in body_lines[:max_preview_lines]])
+            return info_lines
+
         inflight: Optional[asyncio.Task[List[str]]] = None
         inflight_chat_id: Optional[int] = None
         last_fetch_error: Optional[str] = None
         last_fetch_error_chat_id: Optional[int] = None
         cursor_changed_at = time.monotonic()
         last_cursor_chat_id: Optional[int] = None
+        wake_event = asyncio.Event()
+        stdin_fd: Optional[int] = None
+
+        async def _wait_for_wakeup(timeout_s: float) -> None:
+            """
+            Дождаться ввода с клавиатуры, завершения загрузки превью или таймаута.
 
+            В отличие от блокирующего getch() не останавливает event loop
+            (фоновая загрузка превью и клиент Telegram продолжают работать).
+            """
+            if stdin_fd is None:
+                await asyncio.sleep(poll_interval_s)
+                return
+            wake_event.clear()
+            try:
+                await asyncio.wait_for(wake_event.wait(), timeout=max(0.0, timeout_s))
+            except asyncio.TimeoutError:
+                pass
+
+        # Вывод в терминал на время curses перехватывается в файл
+        # (см. _capture_output_to_file)
+        output_capture = ExitStack()
+        output_capture.enter_context(_capture_output_to_file("tui-debug.log"))
         stdscr = None
         try:
             stdscr = curses.initscr()
@@ -1129,17 +1468,47 @@ class ChatSelector:
                     curses.init_pair(5, sel_fg, sel_bg)  # selected
                     selected_attr = curses.color_pair(5)
 
+            # Итоговые атрибуты считаются один раз, в цикле отрисовки только выбираются
+            cursor_attr = (
+                selected_attr
+                if selected_attr is not None
+                else (curses.A_REVERSE | list_attr)
+            )
+            preview_title_attr = curses.A_BOLD
+            preview_text_attr = curses.A_NORMAL
+
+            # Ожидание ввода через event loop: getch() остаётся неблокирующим, а в простое
+            # цикл спит до появления данных в stdin вместо опроса каждые poll_interval_ms.
+            try:
+                stdin_fd = sys.stdin.fileno()
+                asyncio.get_running_loop().add_reader(stdin_fd, wake_event.set)
+            except Exception:
+                # Например, event loop без add_reader (Windows Proactor) — остаётся опрос.
+                stdin_fd = None
+
+            dirty = True
+            last_render_at = 0.0
+            # Снимок состояния последнего отрисованного кадра (пустой — кадр нужно
+            # перерисовать целиком) и счётчик изменений выбора
+            rendered_state: Tuple[Any, ...] = ()
+            selection_version = 0
+            visible_cache_key: Optional[Tuple[Any, ...]] = None
+            visible_cache: List[ChatListItem] = []
+            last_preview_w = -1
+            drawn_preview_lines: List[str] = []
+            # Строка статуса пересобирается только при смене её полей
+            last_meta_key: Optional[Tuple[Any, ...]] = None
+            meta = ""
             while True:
                 # Обработать завершение фонового запроса превью
                 if inflight is not None and inflight.done():
+                    dirty = True
                     try:
                         msgs = inflight.result()
                         if inflight_chat_id is not None:
-                            preview_cache[inflight_chat_id] = (time.monotonic(), msgs)
-                            preview_cache.move_to_end(inflight_chat_id)
-                            if cache_size > 0:
-                                while len(preview_cache) > cache_size:
-                                    preview_cache.popitem(last=False)
+                            _lru_put(
+                                preview_cache, inflight_chat_id, (time.monotonic(), msgs)
+                            )
                         last_fetch_error = None
                         last_fetch_error_chat_id = None
                     except Exception as e:  # noqa: BLE001
@@ -1149,72 +1518,77 @@ class ChatSelector:
                         inflight = None
                         inflight_chat_id = None
 
-                filtered_items = _visible_items()
-                stdscr.erase()
+                # Пересчитывать видимый список только при смене фильтра/поиска/выбора
+                visible_key = (
+                    filter_mode,
+                    search_query,
+                    show_selected_only,
+                    selection_version if show_selected_only else None,
+                )
+                if visible_key != visible_cache_key:
+                    visible_cache = _visible_items()
+                    visible_cache_key = visible_key
+                filtered_items = visible_cache
                 height, width = stdscr.getmaxyx()
 
-                header = str(text_cfg.get("header", self._DEFAULT_TUI_CONFIG["text"]["header"]))
-                _addstr_safe(stdscr, 0, 0, header, max(0, width - 1), header_attr)
-
                 if not filtered_items:
-                    empty_msg = (
-                        str(text_cfg.get("no_selected", self._DEFAULT_TUI_CONFIG["text"]["no_selected"]))
-                        if show_selected_only
-                        else str(text_cfg.get("no_chats", self._DEFAULT_TUI_CONFIG["text"]["no_chats"]))
-                    )
-                    _addstr_safe(
-                        stdscr,
-                        2,
-                        0,
-                        empty_msg,
-                        max(0, width - 1),
-                    )
-                    meta0 = (
-                        f"Режим: {'выбранные' if show_selected_only else 'все'} | "
-                        f"Фильтр: {_filter_label(filter_mode)} | Поиск: {search_query or '—'}"
-                    )
-                    _addstr_safe(stdscr, 3, 0, meta0, max(0, width - 1))
-                    stdscr.refresh()
-                    k0 = stdscr.getch()
-                    if k0 in keymap["quit"]:
+                    if dirty:
+                        stdscr.erase()
+                        _addstr_safe(
+                            stdscr, 0, 0, header_text, max(0, width - 1), header_attr
+                        )
+                        empty_msg = (
+                            no_selected_text if show_selected_only else no_chats_text
+                        )
+                        _addstr_safe(
+                            stdscr,
+                            2,
+                            0,
+                            empty_msg,
+                            max(0, width - 1),
+                        )
+                        meta0 = (
+                            f"Режим: {'выбранные' if show_selected_only else 'все'} | "
+                            f"Фильтр: {_filter_label(filter_mode)} | Поиск: {search_query or '—'}"
+                        )
+                        _addstr_safe(stdscr, 3, 0, meta0, max(0, width - 1))
+                        stdscr.refresh()
+                        dirty = False
+                        rendered_state = ()
+                    key0 = stdscr.getch()
+                    if key0 == -1:
+                        await _wait_for_wakeup(idle_timeout_s)
+                        continue
+                    dirty = True
+                    action0 = key_to_action.get(key0)
+                    if action0 == "quit":
                         return []
-                    if k0 in keymap["confirm"]:
+                    if action0 == "confirm":
                         break
-                    if k0 in keymap["show_selected"]:
+                    if action0 == "show_selected":
                         show_selected_only = not show_selected_only
                         index = 0
                         offset = 0
-                    if k0 in keymap["filter"]:
-                        filter_mode = {
-                            "all": "groups_channels",
-                            "groups_channels": "channels",
-                            "channels": "groups",
-                            "groups": "users",
-                            "users": "all",
-                        }.get(filter_mode, "all")
-                    if k0 in keymap["clear"]:
+                    elif action0 == "filter":
+                        filter_mode = _FILTER_CYCLE.get(filter_mode, "all")
+                    elif action0 == "clear":
                         search_query = ""
-                    if k0 in keymap["search"]:
+                    elif action0 == "search":
                         search_query = _prompt_input(
-                            stdscr,
-                            str(
-                                text_cfg.get(
-                                    "search_prompt",
-                                    self._DEFAULT_TUI_CONFIG["text"]["search_prompt"],
-                                )
-                            ),
-                            initial=search_query,
+                            stdscr, search_prompt_text, initial=search_query
                         ).strip()
-                    await asyncio.sleep(poll_interval_s)
+                    # Дать отработать другим задачам event loop даже при непрерывном вводе
+                    await asyncio.sleep(0)
                     continue
 
                 # Разделение на список/превью
-                list_min_width = int(layout_cfg.get("list_min_width", 30))
-                list_width_ratio = float(layout_cfg.get("list_width_ratio", 0.5))
-                preview_min_width = int(layout_cfg.get("preview_min_width", 10))
                 list_w = max(list_min_width, int(width * list_width_ratio))
                 preview_w = max(0, width - list_w - 1)
                 list_h = max(0, height - 2)
+                if preview_w != last_preview_w:
+                    # Ресайз: строки под старую ширину больше не понадобятся
+                    wrap_cache.clear()
+                    last_preview_w = preview_w
 
                 # Нормализовать индекс при смене фильтра/поиска
                 if index >= len(filtered_items):
@@ -1227,216 +1601,256 @@ class ChatSelector:
                     offset = max(0, index - list_h + 1)
 
                 cur = filtered_items[index]
+                wait_s = idle_timeout_s
                 if last_cursor_chat_id != cur.chat_id:
                     last_cursor_chat_id = cur.chat_id
                     cursor_changed_at = time.monotonic()
 
                 # Запланировать on-demand подкачку превью (вариант B)
                 if fetch_mode == "on_demand" and preview_messages_count > 1:
-                    cached = preview_cache.get(cur.chat_id)
                     now = time.monotonic()
-                    is_fresh = (
-                        cached is not None
-                        and (cache_ttl_s <= 0 or (now - cached[0]) <= cache_ttl_s)
-                        and len(cached[1]) >= 1
-                    )
+                    is_fresh = _fresh_preview(cur.chat_id, now) is not None
+                    if (
+                        inflight is not None
+                        and inflight_chat_id != cur.chat_id
+                        and not is_fresh
+                        and (now - cursor_changed_at) >= debounce_s
+                    ):
+                        # Курсор ушёл и задержался на другом чате — устаревший запрос
+                        # отменяем, чтобы не ждать его перед загрузкой нужного превью
+                        inflight.cancel()
+                        inflight = None
+                        inflight_chat_id = None
                     should_fetch = (not is_fresh) and (inflight is None) and ((now - cursor_changed_at) >= debounce_s)
                     if should_fetch:
                         inflight_chat_id = cur.chat_id
                         inflight = asyncio.create_task(_fetch_preview(cur.chat_id, preview_messages_count))
+                        inflight.add_done_callback(lambda _task: wake_event.set())
+                        dirty = True
+                    elif not is_fresh and inflight is None:
+                        # Проснуться ровно к окончанию дебаунса
+                        wait_s = min(
+                            wait_s, max(0.0, debounce_s - (now - cursor_changed_at))
+                        )
 
-                # Рендер списка
-                selected_pos: Dict[int, int] = {cid: (idx_o + 1) for idx_o, cid in enumerate(selected_order)}
-                for row in range(list_h):
-                    i = offset + row
-                    if i >= len(filtered_items):
-                        break
-                    it = filtered_items[i]
-                    if it.chat_id in selected_pos:
-                        pos = selected_pos[it.chat_id]
-                        mark = f"[{pos:02d}]" if pos <= 99 else "[**]"
-                    else:
-                        mark = "[  ]"
-                    chat_id_suffix = f" ({it.chat_id})" if show_chat_id else ""
-                    line = f"{mark} {_type_label(it.chat_type)} {it.title}{chat_id_suffix}"
-                    if i == index:
-                        attr = selected_attr if selected_attr is not None else (curses.A_REVERSE | list_attr)
-                    else:
-                        attr = list_attr
-                    _addstr_safe(stdscr, 1 + row, 0, line, max(0, list_w - 1), attr)
-
-                # Рендер превью
-                if preview_w >= preview_min_width:
-                    _addstr_safe(stdscr, 1, list_w, "│", 1, sep_attr)
-
-                    header_lines: List[str] = [f"{_type_label(cur.chat_type)} {cur.title}"]
-                    if show_chat_id:
-                        header_lines.append(f"chat_id: {cur.chat_id}")
-
-                    # Получить тело превью
-                    body_lines: List[str] = []
-                    if preview_messages_count <= 1 or fetch_mode == "off":
-                        label = label_single
-                        text = cur.last_message_preview or "<пусто>"
-                        if wrap_enabled:
-                            body_lines = _wrap_lines(text, max(0, preview_w - 2))
-                        else:
-                            body_lines = [_truncate(text, max(0, preview_w - 2))]
-                    else:
-                        label = label_multi
-                        cached = preview_cache.get(cur.chat_id)
-                        now = time.monotonic()
-                        fresh = (
-                            cached is not None
-                            and (cache_ttl_s <= 0 or (now - cached[0]) <= cache_ttl_s)
-                            and len(cached[1]) >= 1
+                # Всё, от чего зависит кадр. Если с прошлой отрисовки ничего не изменилось
+                # (нажатие без эффекта, пробуждение по таймауту) — экран не трогаем.
+                list_state = (
+                    width,
+                    height,
+                    index,
+                    offset,
+                    filter_mode,
+                    search_query,
+                    show_selected_only,
+                    selection_version,
+                    cur.chat_id,
+                )
+                cached_cur = preview_cache.get(cur.chat_id)
+                frame_state = (
+                    list_state,
+                    cached_cur[0] if cached_cur is not None else None,
+                    inflight_chat_id,
+                    last_fetch_error_chat_id,
+                    last_fetch_error,
+                )
+                if frame_state == rendered_state:
+                    dirty = False
+
+                # Leading-edge троттлинг: первый кадр после паузы рисуется сразу, а серия
+                # быстрых нажатий (автоповтор, вставка) сворачивается в один кадр.
+                now = time.monotonic()
+                if dirty and (now - last_render_at) >= poll_interval_s:
+                    last_render_at = now
+                    info_lines = (
+                        _preview_info_lines(cur, preview_w)
+                        if preview_w >= preview_min_width
+                        else []
+                    )
+                    # Список и курсор на месте, изменилось только превью (догрузились
+                    # сообщения, ошибка) — перерисовываем лишь изменившиеся строки
+                    # правой панели без erase().
+                    # Если превью доходит до подвала, рисуем кадр целиком.
+                    preview_only = (
+                        bool(rendered_state)
+                        and rendered_state[0] == list_state
+                        and max(len(info_lines), len(drawn_preview_lines)) < height - 1
+                    )
+                    rendered_state = frame_state
+
+                    if not preview_only:
+                        stdscr.erase()
+                        _addstr_safe(
+                            stdscr, 0, 0, header_text, max(0, width - 1), header_attr
                         )
-                        if fresh:
-                            msgs = cached[1][:preview_messages_count]
-                            prefix_w = len("10. ")
-                            for idx_m, msg in enumerate(msgs, 1):
-                                prefix = f"{idx_m}. "
-                                if wrap_enabled:
-                                    wrapped = _wrap_lines(msg, max(0, (preview_w - 2) - len(prefix)))
-                                    for j, wl in enumerate(wrapped):
-                                        body_lines.append((prefix if j == 0 else " " * len(prefix)) + wl)
-                                else:
-                                    body_lines.append(prefix + _truncate(msg, max(0, (preview_w - 2) - len(prefix))))
-                                if len(body_lines) >= max_preview_lines:
-                                    break
-                        elif show_loading and inflight is not None and inflight_chat_id == cur.chat_id:
-                            body_lines = [loading_text]
-                        elif last_fetch_error and last_fetch_error_chat_id == cur.chat_id:
-                            body_lines = [_truncate(last_fetch_error, max(0, preview_w - 2))]
-                        else:
-                            # Фолбэк (без сети пока нет данных)
-                            text = cur.last_message_preview or "<пусто>"
-                            body_lines = _wrap_lines(text, max(0, preview_w - 2)) if wrap_enabled else [_truncate(text, max(0, preview_w - 2))]
-
-                    # Собрать и вывести, ограничив высоту
-                    info_lines: List[str] = []
-                    info_lines.extend(header_lines)
-                    info_lines.append("")
-                    info_lines.append(label)
-                    if not body_lines:
-                        body_lines = ["<пусто>"]
-                    if wrap_enabled:
-                        info_lines.extend(body_lines[:max_preview_lines])
-                    else:
-                        info_lines.extend([_truncate(x, max(0, preview_w - 2)) for x in body_lines[:max_preview_lines]])
 
+                        # Рендер списка
+                        for row in range(list_h):
+                            i = offset + row
+                            if i >= len(filtered_items):
+                                break
+                            it = filtered_items[i]
+                            pos = selected_pos.get(it.chat_id, 0)
+                            mark = _MARKS[pos] if pos < len(_MARKS) else _MARK_OVERFLOW
+                            chat_id_suffix = f" ({it.chat_id})" if show_chat_id else ""
+                            line = f"{mark} {_type_label(it.chat_type)} {it.title}{chat_id_suffix}"
+                            attr = cursor_attr if i == index else list_attr
+                            _addstr_safe(stdscr, 1 + row, 0, line, max(0, list_w - 1), attr)
+
+                    # Рендер превью
+                    if info_lines and not preview_only:
+                        _addstr_safe(stdscr, 1, list_w, "│", 1, sep_attr)
                     y = 1
                     for idx_line, part in enumerate(info_lines):
                         if y >= height:
                             break
-                        attr_line = curses.A_BOLD if idx_line == 0 else curses.A_NORMAL
+                        if preview_only:
+                            if (
+                                idx_line < len(drawn_preview_lines)
+                                and drawn_preview_lines[idx_line] == part
+                            ):
+                                y += 1
+                                continue
+                            _clear_to_eol(stdscr, y, list_w + 1)
+                        attr_line = (
+                            preview_title_attr if idx_line == 0 else preview_text_attr
+                        )
                         # Чтобы curses не переносил wide‑символы в колонку 0 следующей строки,
                         # оставляем небольшой запас (−1 колонка).
                         _addstr_safe(stdscr, y, list_w + 1, part, max(0, preview_w - 3), attr_line)
                         y += 1
+                    if preview_only:
+                        # Новое превью короче прошлого — стереть оставшиеся строки
+                        for y_old in range(
+                            1 + len(info_lines), 1 + len(drawn_preview_lines)
+                        ):
+                            _clear_to_eol(stdscr, y_old, list_w + 1)
+                    drawn_preview_lines = info_lines
+
+                    if not preview_only:
+                        meta_key = (
+                            show_selected_only,
+                            filter_mode,
+                            search_query,
+                            len(filtered_items),
+                            len(selected),
+                        )
+                        if meta_key != last_meta_key:
+                            last_meta_key = meta_key
+                            meta = (
+                                f"Режим: {'выбранные' if show_selected_only else 'все'} | "
+                                f"Фильтр: {_filter_label(filter_mode)} | "
+                                f"Поиск: {search_query or '—'} | "
+                                f"Показано: {len(filtered_items)}/{len(items)} | "
+                                f"Выбрано: {len(selected)}"
+                            )
+                        if height > 1:
+                            _addstr_safe(stdscr, height - 1, 0, meta, max(0, width - 1), footer_attr)
 
-                meta = (
-                    f"Режим: {'выбранные' if show_selected_only else 'все'} | "
-                    f"Фильтр: {_filter_label(filter_mode)} | "
-                    f"Поиск: {search_query or '—'} | "
-                    f"Показано: {len(filtered_items)}/{len(items)} | "
-                    f"Выбрано: {len(selected)}"
-                )
-                if height > 1:
-                    _addstr_safe(stdscr, height - 1, 0, meta, max(0, width - 1), footer_attr)
+                    stdscr.refresh()
+                    dirty = False
 
-                stdscr.refresh()
                 key = stdscr.getch()
+                if key == -1:
+                    # Ввода нет — ждём клавишу, завершение загрузки превью или дебаунс,
+                    # не перерисовывая экран впустую.
+                    if dirty:
+                        # Отложенный кадр: дорисовать, как только истечёт интервал
+                        # троттлинга
+                        wait_s = min(
+                            wait_s, poll_interval_s - (time.monotonic() - last_render_at)
+                        )
+                    await _wait_for_wakeup(wait_s)
+                    continue
 
-                if key != -1:
-                    if key in keymap["quit"]:
-                        return []
-                    if key in keymap["confirm"]:
-                        break
-                    if key in keymap["show_selected"]:
-                        show_selected_only = not show_selected_only
-                        index = 0
-                        offset = 0
-                    if key in keymap["toggle"]:
-                        cid = filtered_items[index].chat_id
-                        if cid in selected:
-                            selected.remove(cid)
-                            try:
-                                selected_order.remove(cid)
-                            except ValueError:
-                                pass
-                        else:
-                            selected.add(cid)
-                            selected_order.append(cid)
-                    elif key in keymap["move_up"]:
-                        cid = filtered_items[index].chat_id
-                        if cid in selected:
-                            try:
-                                p = selected_order.index(cid)
-                            except ValueError:
-                                p = -1
-                            if p > 0:
-                                selected_order[p - 1], selected_order[p] = selected_order[p], selected_order[p - 1]
-                                # В режиме "только выбранные" курсор должен ехать вместе с чатом
-                                if show_selected_only:
-                                    index = p - 1
-                    elif key in keymap["move_down"]:
-                        cid = filtered_items[index].chat_id
-                        if cid in selected:
-                            try:
-                                p = selected_order.index(cid)
-                            except ValueError:
-                                p = -1
-                            if 0 <= p < (len(selected_order) - 1):
-                                selected_order[p + 1], selected_order[p] = selected_order[p], selected_order[p + 1]
-                                # В режиме "только выбранные" курсор должен ехать вместе с чатом
-                                if show_selected_only:
-                                    index = p + 1
-                    elif key in keymap["clear"]:
-                        search_query = ""
-                        index = 0
-                        offset = 0
-                    elif key in keymap["search"]:
-                        search_query = _prompt_input(
-                            stdscr,
-                            str(
-                                text_cfg.get(
-                                    "search_prompt",
-                                    self._DEFAULT_TUI_CONFIG["text"]["search_prompt"],
-                                )
-                            ),
-                            initial=search_query,
-                        ).strip()
-                        index = 0
-                        offset = 0
-                    elif key in keymap["filter"]:
-                        filter_mode = {
-                            "all": "groups_channels",
-                            "groups_channels": "channels",
-                            "channels": "groups",
-                            "groups": "users",
-                            "users": "all",
-                        }.get(filter_mode, "all")
-                        index = 0
-                        offset = 0
-                    elif key in keymap["up"]:
-                        index = max(0, index - 1)
-                    elif key in keymap["down"]:
-                        index = min(len(filtered_items) - 1, index + 1)
-                    elif key in keymap["page_up"]:
-                        index = max(0, index - max(1, list_h))
-                    elif key in keymap["page_down"]:
-                        index = min(len(filtered_items) - 1, index + max(1, list_h))
-                    elif key in keymap["home"]:
-                        index = 0
-                    elif key in keymap["end"]:
-                        index = len(filtered_items) - 1
-
-                # Ограничить частоту перерисовки, чтобы UI не "мигал" на быстрых повторах клавиш
-                await asyncio.sleep(poll_interval_s)
+                dirty = True
+                action = key_to_action.get(key)
+                if action == "quit":
+                    return []
+                if action == "confirm":
+                    break
+                if action == "show_selected":
+                    show_selected_only = not show_selected_only
+                    index = 0
+                    offset = 0
+                elif action == "toggle":
+                    cid = filtered_items[index].chat_id
+                    if cid in selected:
+                        selected.remove(cid)
+                        p = selected_pos.pop(cid, 0) - 1
+                        if p >= 0:
+                            del selected_order[p]
+                            # Перенумеровать только хвост очереди после удалённого
+                            for idx_o in range(p, len(selected_order)):
+                                selected_pos[selected_order[idx_o]] = idx_o + 1
+                    else:
+                        selected.add(cid)
+                        selected_order.append(cid)
+                        selected_pos[cid] = len(selected_order)
+                    selection_version += 1
+                elif action == "move_up":
+                    cid = filtered_items[index].chat_id
+                    if cid in selected:
+                        p = selected_pos.get(cid, 0) - 1
+                        if p > 0:
+                            selected_order[p - 1], selected_order[p] = selected_order[p], selected_order[p - 1]
+                            selected_pos[selected_order[p - 1]] = p
+                            selected_pos[selected_order[p]] = p + 1
+                            selection_version += 1
+                            # В режиме "только выбранные" курсор должен ехать вместе с чатом
+                            if show_selected_only:
+                                index = p - 1
+                elif action == "move_down":
+                    cid = filtered_items[index].chat_id
+                    if cid in selected:
+                        p = selected_pos.get(cid, 0) - 1
+                        if 0 <= p < (len(selected_order) - 1):
+                            selected_order[p + 1], selected_order[p] = selected_order[p], selected_order[p + 1]
+                            selected_pos[selected_order[p]] = p + 1
+                            selected_pos[selected_order[p + 1]] = p + 2
+                            selection_version += 1
+                            # В режиме "только выбранные" курсор должен ехать вместе с чатом
+                            if show_selected_only:
+                                index = p + 1
+                elif action == "clear":
+                    search_query = ""
+                    index = 0
+                    offset = 0
+                elif action == "search":
+                    search_query = _prompt_input(
+                        stdscr, search_prompt_text, initial=search_query
+                    ).strip()
+                    index = 0
+                    offset = 0
+                    # Строка ввода затёрла подвал — кадр нужно перерисовать целиком
+                    rendered_state = ()
+                elif action == "filter":
+                    filter_mode = _FILTER_CYCLE.get(filter_mode, "all")
+                    index = 0
+                    offset = 0
+                elif action == "up":
+                    index = max(0, index - 1)
+                elif action == "down":
+                    index = min(len(filtered_items) - 1, index + 1)
+                elif action == "page_up":
+                    index = max(0, index - max(1, list_h))
+                elif action == "page_down":
+                    index = min(len(filtered_items) - 1, index + max(1, list_h))
+                elif action == "home":
+                    index = 0
+                elif action == "end":
+                    index = len(filtered_items) - 1
+
+                # Дать отработать другим задачам event loop даже при непрерывном вводе
+                await asyncio.sleep(0)
         finally:
             if inflight is not None and not inflight.done():
                 inflight.cancel()
+            if stdin_fd is not None:
+                try:
+                    asyncio.get_running_loop().remove_reader(stdin_fd)
+                except Exception:
+                    pass
             if stdscr is not None:
                 try:
                     stdscr.keypad(False)
@@ -1449,48 +1863,24 @@ class ChatSelector:
             except Exception:
                 pass
             # Восстановить stdout/stderr и обработчики логгера
-            try:
-                sys.stdout = saved_stdout
-                sys.stderr = saved_stderr
-            except Exception:
-                pass
-            try:
-                if tui_file_handler is not None:
-                    try:
-                        root_logger.removeHandler(tui_file_handler)
-                    except Exception:
-                        pass
-                    try:
-                        tui_file_handler.close()
-                    except Exception:
-                        pass
-                # Восстановить исходные handlers как были
-                root_logger.handlers = saved_handlers  # type: ignore[assignment]
-                root_logger.setLevel(saved_root_level)
-            except Exception:
-                pass
-            try:
-                if tui_log_file is not None:
-                    tui_log_file.flush()
-                    tui_log_file.close()
-            except Exception:
-                pass
-
-        by_id: Dict[int, ChatListItem] = {i.chat_id: i for i in items}
-        out: List[Tuple[int, str, str]] = []
-        used: Set[int] = set()
-        for cid in selected_order:
-            it = by_id.get(cid)
-            if it is None:
-                continue
-            if cid not in selected:
-                continue
-            out.append((it.chat_id, it.title, it.chat_type))
-            used.add(cid)
+            output_capture.close()
+
+        ordered = [
+            by_id[cid] for cid in selected_order if cid in selected and cid in by_id
+        ]
+        out: List[Tuple[int, str, str]] = [
+            (it.chat_id, it.title, it.chat_type) for it in ordered
+        ]
         # На всякий случай добавить выбранные, которые почему-то не попали в order
-        for it in items:
-            if it.chat_id in selected and it.chat_id not in used:
-                out.append((it.chat_id, it.title, it.chat_type))
+        # (в порядке items); обычно таких нет, и полный проход не нужен
+        used: Set[int] = {it.chat_id for it in ordered}
+        leftover = {cid for cid in selected if cid not in used and cid in by_id}
+        if leftover:
+            out.extend(
+                (it.chat_id, it.title, it.chat_type)
+                for it in items
+                if it.chat_id in leftover
+            )
         return out
 
     async def select_chats(
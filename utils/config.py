@@ -1,13 +1,104 @@
 """Утилиты для управления конфигурацией."""
 import logging
 import os
+import types
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
 
 import yaml
 
 logger = logging.getLogger(__name__)
 
+# Загрузчик/дампер на libyaml (в разы быстрее), если PyYAML собран с ним;
+# иначе — чистые Python-реализации с тем же безопасным набором типов.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# Допустимые значения media_types (порядок строки — как в документации)
+_VALID_MEDIA_TYPES_ORDERED = (
+    "audio",
+    "document",
+    "photo",
+    "video",
+    "voice",
+    "video_note",
+    "all",
+)
+_VALID_MEDIA_TYPES = frozenset(_VALID_MEDIA_TYPES_ORDERED)
+_VALID_MEDIA_TYPES_STR = ", ".join(_VALID_MEDIA_TYPES_ORDERED)
+
+# Буфер записи config.yaml: файл уходит на диск одной-двумя операциями
+_SAVE_BUFFER_SIZE = 64 * 1024
+
+
+def _proxy_error(proxy_config: Any) -> Optional[str]:
+    """Текст ошибки настроек прокси или None, если они валидны."""
+    # Отложенный импорт для избежания циклической зависимости
+    from utils.proxy import proxy_config_error
+
+    return proxy_config_error(proxy_config)
+
+
+@lru_cache(maxsize=16)
+def _proxy_error_cached(items: Tuple[Tuple[Any, Any], ...]) -> Optional[str]:
+    """
+    Проверить настройки прокси, заданные парами (ключ, значение), с кэшем.
+
+    Кэшируется только чистая проверка: ошибку пишет в лог вызывающий код,
+    поэтому она выводится при каждой загрузке конфига.
+
+    Parameters
+    ----------
+    items: Tuple[Tuple[Any, Any], ...]
+        Отсортированные пары словаря proxy.
+
+    Returns
+    -------
+    Optional[str]
+        Текст ошибки или None, если настройки валидны.
+    """
+    return _proxy_error(dict(items))
+
+
+def _validate_proxy(proxy_config: Any) -> bool:
+    """Проверить настройки прокси; проверка одного и того же словаря кэшируется."""
+    error: Optional[str]
+    key: Optional[Tuple[Tuple[Any, Any], ...]] = None
+    if isinstance(proxy_config, dict):
+        try:
+            key = tuple(sorted(proxy_config.items()))
+            hash(key)
+        except TypeError:
+            # Нехэшируемые или несравнимые значения — проверяем без кэша
+            key = None
+    if key is not None:
+        error = _proxy_error_cached(key)
+    else:
+        error = _proxy_error(proxy_config)
+    if error is not None:
+        logger.error(error)
+        return False
+    return True
+
+
+def _file_key(path: str) -> Tuple[str, int, int]:
+    """
+    Получить ключ актуальности файла конфигурации.
+
+    Parameters
+    ----------
+    path: str
+        Путь к файлу конфигурации.
+
+    Returns
+    -------
+    Tuple[str, int, int]
+        Абсолютный путь, mtime_ns и размер файла.
+    """
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
 
 class ConfigManager:
     """Класс для управления конфигурацией проекта."""
@@ -27,6 +118,18 @@ class ConfigManager:
             )
         self.config_path = config_path
         self._config: Optional[Dict[str, Any]] = None
+        # Read-only представление текущего конфига, создаётся в load()
+        self._config_view: Mapping[str, Any] = types.MappingProxyType({})
+        # Содержимое config.yaml, прочитанное или записанное этим менеджером последним,
+        # с ключом актуальности файла: save() не перезаписывает файл тем же содержимым
+        self._file_state: Optional[Tuple[Tuple[str, int, int], bytes]] = None
+        # Индекс записей config["chats"] по chat_id и максимальный order.
+        # Строятся лениво и пересобираются, если список чатов заменили или
+        # изменили его длину в обход ConfigManager.
+        self._chats_index: Dict[int, Dict[str, Any]] = {}
+        self._chats_index_src: Optional[List[Any]] = None
+        self._chats_index_len = 0
+        self._chats_max_order: Optional[int] = None
 
     def load(self) -> Dict[str, Any]:
         """
@@ -47,8 +150,14 @@ class ConfigManager:
         if not os.path.exists(self.config_path):
             raise FileNotFoundError(f"Файл конфигурации не найден: {self.config_path}")
 
-        with open(self.config_path, "r", encoding="utf-8") as f:
-            self._config = yaml.safe_load(f) or {}
+        # Файл читается одним вызовом, байты передаются парсеру напрямую:
+        # кодировку (UTF-8/UTF-16 с BOM) он определяет сам
+        file_key = _file_key(self.config_path)
+        with open(self.config_path, "rb") as f:
+            data = f.read()
+        self._config = yaml.load(data, Loader=_YAML_LOADER) or {}  # noqa: S506
+        self._file_state = (file_key, data)
+        self._config_view = types.MappingProxyType(self._config)
 
         self.validate()
         return self._config
@@ -81,27 +190,23 @@ class ConfigManager:
 
         # Валидация media_types
         if "media_types" in self._config:
-            valid_media_types = [
-                "audio",
-                "document",
-                "photo",
-                "video",
-                "voice",
-                "video_note",
-                "all",
-            ]
             media_types = self._config["media_types"]
             if isinstance(media_types, list):
                 for media_type in media_types:
-                    if media_type not in valid_media_types:
+                    if (
+                        not isinstance(media_type, str)
+                        or media_type not in _VALID_MEDIA_TYPES
+                    ):
                         raise ValueError(
                             f"Некорректный тип медиа: {media_type}. "
-                            f"Допустимые значения: {', '.join(valid_media_types)}"
+                            f"Допустимые значения: {_VALID_MEDIA_TYPES_STR}"
                         )
-            elif media_types not in valid_media_types:
+            elif (
+                not isinstance(media_types, str) or media_types not in _VALID_MEDIA_TYPES
+            ):
                 raise ValueError(
                     f"Некорректный тип медиа: {media_types}. "
-                    f"Допустимые значения: {', '.join(valid_media_types)}"
+                    f"Допустимые значения: {_VALID_MEDIA_TYPES_STR}"
                 )
 
         # Валидация file_formats
@@ -118,10 +223,7 @@ class ConfigManager:
 
         # Валидация proxy
         if "proxy" in self._config:
-            # Отложенный импорт для избежания циклической зависимости
-            from utils.proxy import validate_proxy_config
-
-            if not validate_proxy_config(self._config["proxy"]):
+            if not _validate_proxy(self._config["proxy"]):
                 logger.warning("⚠️ Конфигурация прокси невалидна, прокси не будет использован")
                 self._config["proxy"] = None
 
@@ -138,13 +240,102 @@ class ConfigManager:
         if config_to_save is None:
             raise ValueError("Нет конфигурации для сохранения")
 
+        data = yaml.dump(
+            config_to_save,
+            Dumper=_YAML_DUMPER,
+            default_flow_style=False,
+            allow_unicode=True,
+        ).encode("utf-8")
+
+        # Файл не менялся с последней загрузки/сохранения, а содержимое то же —
+        # перезаписывать нечего (save() вызывается после каждой партии сообщений)
+        try:
+            file_key: Optional[Tuple[str, int, int]] = _file_key(self.config_path)
+        except OSError:
+            file_key = None
+        if file_key is not None and self._file_state == (file_key, data):
+            return
+
         # Создать директорию, если не существует
         config_dir = os.path.dirname(self.config_path)
         if config_dir:
             os.makedirs(config_dir, exist_ok=True)
 
-        with open(self.config_path, "w", encoding="utf-8") as f:
-            yaml.dump(config_to_save, f, default_flow_style=False, allow_unicode=True)
+        # Атомарная запись: временный файл рядом с целевым, fsync и os.replace.
+        # При падении посреди записи config.yaml остаётся прежним, а не обрезанным.
+        target_path = os.path.realpath(self.config_path)
+        tmp_path = f"{target_path}.tmp"
+        try:
+            mode = os.stat(target_path).st_mode & 0o777
+        except OSError:
+            mode = 0o666
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            with os.fdopen(fd, "wb", buffering=_SAVE_BUFFER_SIZE) as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._file_state = (_file_key(self.config_path), data)
+
+    def _get_chats_index(self, chats_list: List[Any]) -> Dict[int, Dict[str, Any]]:
+        """
+        Получить индекс {chat_id: запись} для списка чатов.
+
+        Parameters
+        ----------
+        chats_list: List[Any]
+            Список `config["chats"]`.
+
+        Returns
+        -------
+        Dict[int, Dict[str, Any]]
+            Индекс записей; при дублях chat_id используется первая запись.
+        """
+        if (
+            self._chats_index_src is not chats_list
+            or self._chats_index_len != len(chats_list)
+        ):
+            index: Dict[int, Dict[str, Any]] = {}
+            for chat in chats_list:
+                if isinstance(chat, dict) and "chat_id" in chat:
+                    index.setdefault(chat["chat_id"], chat)
+            self._chats_index = index
+            self._chats_index_src = chats_list
+            self._chats_index_len = len(chats_list)
+            self._chats_max_order = None
+        return self._chats_index
+
+    def _append_chat(self, chats_list: List[Any], chat: Dict[str, Any]) -> None:
+        """Добавить запись в список чатов, поддерживая индекс актуальным."""
+        index = self._get_chats_index(chats_list)
+        chats_list.append(chat)
+        index.setdefault(chat["chat_id"], chat)
+        self._chats_index_len = len(chats_list)
+        if self._chats_max_order is not None and "order" in chat:
+            self._chats_max_order = max(self._chats_max_order, chat["order"])
+
+    def _get_max_chat_order(self, chats_list: List[Any]) -> int:
+        """Максимальный order среди чатов (-1, если его нет ни у одного)."""
+        self._get_chats_index(chats_list)
+        if self._chats_max_order is None:
+            max_order = -1
+            for chat in chats_list:
+                if isinstance(chat, dict) and "order" in chat:
+                    try:
+                        order = int(chat.get("order", -1))
+                        if order > max_order:
+                            max_order = order
+                    except (ValueError, TypeError):
+                        pass
+            self._chats_max_order = max_order
+        return self._chats_max_order
 
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -202,13 +393,15 @@ class ConfigManager:
 
         # Поддержка новой структуры с несколькими чатами
         if "chats" in self._config and isinstance(self._config["chats"], list):
-            for chat in self._config["chats"]:
-                if chat.get("chat_id") == chat_id:
-                    chat["last_read_message_id"] = last_read_message_id
-                    chat["ids_to_retry"] = ids_to_retry
-                    return
+            chats_list: List[Any] = self._config["chats"]
+            chat = self._get_chats_index(chats_list).get(chat_id)
+            if chat is not None:
+                chat["last_read_message_id"] = last_read_message_id
+                chat["ids_to_retry"] = ids_to_retry
+                return
             # Если чат не найден, добавить его
-            self._config["chats"].append(
+            self._append_chat(
+                chats_list,
                 {
                     "chat_id": chat_id,
                     "last_read_message_id": last_read_message_id,
@@ -247,9 +440,7 @@ class ConfigManager:
             self._config["chats"] = []
 
         chats_list: List[Dict[str, Any]] = self._config["chats"]
-        by_id: Dict[int, Dict[str, Any]] = {
-            c.get("chat_id"): c for c in chats_list if isinstance(c, dict) and "chat_id" in c
-        }
+        by_id = self._get_chats_index(chats_list)
 
         # По умолчанию выключить все
         for chat in chats_list:
@@ -265,8 +456,7 @@ class ConfigManager:
                     "last_read_message_id": 0,
                     "ids_to_retry": [],
                 }
-                chats_list.append(existing)
-                by_id[chat_id] = existing
+                self._append_chat(chats_list, existing)
 
             # Обновить title, если получили непустой
             if isinstance(title, str) and title.strip():
@@ -280,6 +470,8 @@ class ConfigManager:
             existing["enabled"] = True
             # Порядок очереди загрузки (0-based)
             existing["order"] = order_idx
+        # Порядок переназначен — максимум пересчитается при следующем запросе
+        self._chats_max_order = None
 
     def add_chat_to_download_list(self, chat_id: int, chat_title: Optional[str] = None) -> bool:
         """
@@ -308,12 +500,12 @@ class ConfigManager:
         chats_list: List[Dict[str, Any]] = self._config["chats"]
         
         # Проверить, есть ли уже этот чат в списке
-        for chat in chats_list:
-            if isinstance(chat, dict) and chat.get("chat_id") == chat_id:
-                # Чат уже есть, обновить title если нужно
-                if chat_title and isinstance(chat_title, str) and chat_title.strip():
-                    chat["title"] = chat_title
-                return False
+        chat = self._get_chats_index(chats_list).get(chat_id)
+        if chat is not None:
+            # Чат уже есть, обновить title если нужно
+            if chat_title and isinstance(chat_title, str) and chat_title.strip():
+                chat["title"] = chat_title
+            return False
 
         # Чат не найден, добавить его
         new_chat = {
@@ -325,18 +517,8 @@ class ConfigManager:
         }
         
         # Определить порядок (последний в очереди)
-        max_order = -1
-        for chat in chats_list:
-            if isinstance(chat, dict) and "order" in chat:
-                try:
-                    order = int(chat.get("order", -1))
-                    if order > max_order:
-                        max_order = order
-                except (ValueError, TypeError):
-                    pass
-        
-        new_chat["order"] = max_order + 1
-        chats_list.append(new_chat)
+        new_chat["order"] = self._get_max_chat_order(chats_list) + 1
+        self._append_chat(chats_list, new_chat)
         
         return True
 
@@ -353,3 +535,20 @@ class ConfigManager:
         if self._config is None:
             self.load()
         return self._config or {}
+
+    @property
+    def view(self) -> Mapping[str, Any]:
+        """
+        Получить read-only представление конфигурации без копирования.
+
+        Представление создаётся один раз при загрузке и отражает последующие
+        изменения через set()/update_chat_state(); вложенные словари не защищены.
+
+        Returns
+        -------
+        Mapping[str, Any]
+            Текущая конфигурация только для чтения.
+        """
+        if self._config is None:
+            self.load()
+        return self._config_view
@@ -1,14 +1,48 @@
 """Утилиты для обработки загруженных файлов."""
 
-import glob
+import hashlib
 import os
 import pathlib
-from hashlib import md5
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 
-# Кеш для хешей файлов
-_hash_cache: Dict[str, str] = {}
+# Сколько хешей файлов держать в кеше (LRU)
+_HASH_CACHE_SIZE = 4096
+# Размер блока чтения при хешировании: файл не читается в память целиком
+_HASH_CHUNK_SIZE = 1024 * 1024
+# Сколько кандидатов в дубликаты хешировать параллельно
+_HASH_MAX_WORKERS = 4
+# Недопустимые в именах файлов символы (Windows: < > : " / \ | ? *, а также '+'
+# из часовых поясов) — заменяются за один проход str.translate
+_SANITIZE_TABLE = str.maketrans({
+    ':': '-',
+    '<': '_',
+    '>': '_',
+    '"': "'",
+    '/': '_',
+    '\\': '_',
+    '|': '_',
+    '?': '_',
+    '*': '_',
+    '+': '_',
+})
+
+
+def _new_hash() -> Any:
+    """
+    Создать объект хеша для сравнения содержимого файлов.
+
+    Хеш нужен только для поиска дублей (не криптография): blake2b быстрее MD5,
+    128 бит дайджеста достаточно.
+
+    Returns
+    -------
+    Any
+        Новый объект hashlib.blake2b.
+    """
+    return hashlib.blake2b(digest_size=16)
 
 
 def get_next_name(file_path: str) -> str:
@@ -27,46 +61,91 @@ def get_next_name(file_path: str) -> str:
         Absolute path of the next available name for the file.
     """
     posix_path = pathlib.Path(file_path)
+    # Части пути вычисляются один раз, в цикле меняется только счётчик
+    base: str = os.path.join(str(posix_path.parent), f"{posix_path.stem}-copy")
+    suffix: str = "".join(posix_path.suffixes)
     counter: int = 1
-    new_file_name: str = os.path.join("{0}", "{1}-copy{2}{3}")
-    while os.path.isfile(
-        new_file_name.format(
-            posix_path.parent,
-            posix_path.stem,
-            counter,
-            "".join(posix_path.suffixes),
-        )
-    ):
+    while os.path.isfile(f"{base}{counter}{suffix}"):
         counter += 1
-    return new_file_name.format(
-        posix_path.parent,
-        posix_path.stem,
-        counter,
-        "".join(posix_path.suffixes),
-    )
+    return f"{base}{counter}{suffix}"
 
 
-def _get_file_hash(file_path: str) -> str:
+def sanitize_filename(filename: str) -> str:
     """
-    Получить MD5 хеш файла с использованием кеша.
+    Очистить имя файла от недопустимых символов для Windows и других ОС.
+
+    Parameters
+    ----------
+    filename: str
+        Исходное имя файла.
+
+    Returns
+    -------
+    str
+        Безопасное имя файла.
+    """
+    return filename.translate(_SANITIZE_TABLE)
+
+
+def _get_file_hash(file_path: str, st: Optional[os.stat_result] = None) -> str:
+    """
+    Получить хеш содержимого файла с использованием кеша.
+
+    Кеш ограничен по размеру (LRU) и ключуется по реальному пути, размеру и
+    mtime: разные написания одного пути дают одну запись, а изменённый файл
+    хешируется заново. Файл читается блоками, поэтому потребление памяти не
+    зависит от его размера.
 
     Parameters
     ----------
     file_path: str
         Путь к файлу.
+    st: Optional[os.stat_result]
+        Уже полученный stat файла (например, из os.scandir). Если None,
+        выполняется os.stat.
 
     Returns
     -------
     str
-        MD5 хеш файла.
+        Хеш файла (hex).
     """
-    if file_path in _hash_cache:
-        return _hash_cache[file_path]
+    if st is None:
+        st = os.stat(file_path)
+    return _hash_file(os.path.realpath(file_path), st.st_size, st.st_mtime_ns)
 
-    # pylint: disable = R1732
-    with open(file_path, "rb") as f:
-        file_hash = md5(f.read()).hexdigest()
-    _hash_cache[file_path] = file_hash
+
+@lru_cache(maxsize=_HASH_CACHE_SIZE)
+def _hash_file(real_path: str, size: int, mtime_ns: int) -> str:
+    # pylint: disable=unused-argument
+    """
+    Прочитать файл блоками и вычислить его хеш (результат кешируется).
+
+    Parameters
+    ----------
+    real_path: str
+        Реальный путь к файлу.
+    size: int
+        Размер файла — только часть ключа кеша.
+    mtime_ns: int
+        Время изменения файла — только часть ключа кеша.
+
+    Returns
+    -------
+    str
+        Хеш файла (hex).
+    """
+    with open(real_path, "rb") as f:
+        file_digest = getattr(hashlib, "file_digest", None)
+        if file_digest is not None:
+            # Python 3.11+: цикл чтения выполняется в C
+            file_hash = file_digest(f, _new_hash).hexdigest()
+        else:
+            h = _new_hash()
+            chunk = f.read(_HASH_CHUNK_SIZE)
+            while chunk:
+                h.update(chunk)
+                chunk = f.read(_HASH_CHUNK_SIZE)
+            file_hash = h.hexdigest()
     return file_hash
 
 
@@ -76,8 +155,8 @@ def manage_duplicate_file(
     """
     Проверить, является ли файл дубликатом.
 
-    Сравнивает MD5 хеш файлов с паттерном имени копии
-    и удаляет, если MD5 хеш совпадает.
+    Сравнивает хеш файла с хешами файлов по паттерну имени копии
+    и удаляет файл, если хеши совпадают.
 
     Parameters
     ----------
@@ -94,32 +173,131 @@ def manage_duplicate_file(
     if not enabled:
         return file_path
 
-    if not os.path.exists(file_path):
-        return file_path
-
     posix_path = pathlib.Path(file_path)
     file_base_name: str = "".join(posix_path.stem.split("-copy")[0])
-    name_pattern: str = f"{posix_path.parent}/{file_base_name}*"
-    # Причина использования `str.translate()`
-    # https://stackoverflow.com/q/22055500/6730439
-    old_files: list = glob.glob(
-        name_pattern.translate({ord("["): "[[]", ord("]"): "[]]"})
-    )
-    if file_path in old_files:
-        old_files.remove(file_path)
-
-    current_file_md5: str = _get_file_hash(file_path)
-    for old_file_path in old_files:
-        if not os.path.exists(old_file_path):
-            continue
-        old_file_md5: str = _get_file_hash(old_file_path)
-        if current_file_md5 == old_file_md5:
-            os.remove(file_path)
-            return old_file_path
+    try:
+        current_stat = os.stat(file_path)
+    except OSError:
+        return file_path
+
+    # Один проход по каталогу с проверкой префикса вместо glob: не нужно
+    # экранировать спецсимволы шаблона, каталоги сразу отсеиваются.
+    # stat записей берётся из scandir и переиспользуется ниже вместо
+    # отдельных exists/getsize на каждый файл
+    old_files: Dict[str, os.stat_result] = {}
+    try:
+        with os.scandir(posix_path.parent) as entries:
+            for entry in entries:
+                if not entry.name.startswith(file_base_name):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    # Сам файл исключается по inode, а не по строке пути:
+                    # относительный или ненормализованный file_path (./dir/a.txt)
+                    # с entry.path не совпадёт. entry.inode(), а не
+                    # entry.stat().st_ino — на Windows в stat из scandir st_ino = 0
+                    if entry.path == file_path or entry.inode() == current_stat.st_ino:
+                        continue
+                    old_files[entry.path] = entry.stat()
+                except OSError:
+                    continue
+    except OSError:
+        return file_path
+
+    # Файлы другого размера не могут быть дубликатами: хешируем только кандидатов
+    # того же размера (обычно их нет, и текущий файл не читается вовсе)
+    current_size = current_stat.st_size
+    candidates = [
+        (old_file_path, old_stat)
+        for old_file_path, old_stat in old_files.items()
+        if old_stat.st_size == current_size
+    ]
+    if not candidates:
+        return file_path
+
+    current_file_hash: str = _get_file_hash(file_path, current_stat)
+    if len(candidates) == 1:
+        # Обычный случай: один кандидат хешируется без пула потоков
+        match = _find_same_hash(current_file_hash, candidates)
+    else:
+        match = _find_same_hash_parallel(current_file_hash, candidates)
+    if match is not None:
+        os.remove(file_path)
+        return match
     return file_path
 
 
+def _find_same_hash(
+    file_hash: str, candidates: List[Tuple[str, os.stat_result]]
+) -> Optional[str]:
+    """
+    Последовательно найти первого кандидата с тем же хешем.
+
+    Parameters
+    ----------
+    file_hash: str
+        Хеш проверяемого файла.
+    candidates: List[Tuple[str, os.stat_result]]
+        Пути кандидатов и их stat из сканирования каталога.
+
+    Returns
+    -------
+    Optional[str]
+        Путь совпавшего файла или None.
+    """
+    for old_file_path, old_stat in candidates:
+        try:
+            if _get_file_hash(old_file_path, old_stat) == file_hash:
+                return old_file_path
+        except OSError:
+            # Файл удалён после сканирования каталога
+            continue
+    return None
+
+
+def _find_same_hash_parallel(
+    file_hash: str, candidates: List[Tuple[str, os.stat_result]]
+) -> Optional[str]:
+    """
+    Найти кандидата с тем же хешем, хешируя файлы в пуле потоков.
+
+    hashlib отпускает GIL на больших блоках, поэтому файлы читаются и
+    хешируются параллельно; после первого совпадения ожидающие задачи
+    отменяются.
+
+    Parameters
+    ----------
+    file_hash: str
+        Хеш проверяемого файла.
+    candidates: List[Tuple[str, os.stat_result]]
+        Пути кандидатов и их stat из сканирования каталога.
+
+    Returns
+    -------
+    Optional[str]
+        Путь совпавшего файла или None.
+    """
+    with ThreadPoolExecutor(
+        max_workers=min(_HASH_MAX_WORKERS, len(candidates)),
+        thread_name_prefix="dup-hash",
+    ) as executor:
+        futures = {
+            executor.submit(_get_file_hash, old_file_path, old_stat): old_file_path
+            for old_file_path, old_stat in candidates
+        }
+        for future in as_completed(futures):
+            try:
+                old_file_hash = future.result()
+            except OSError:
+                continue
+            if old_file_hash == file_hash:
+                for pending in futures:
+                    pending.cancel()
+                return futures[future]
+    return None
+
+
 def clear_hash_cache() -> None:
     """Очистить кеш хешей файлов."""
-    global _hash_cache
-    _hash_cache.clear()
+    _hash_file.cache_clear()
@@ -1,16 +1,81 @@
 """Модуль для фильтрации сообщений."""
 import logging
+import sys
 from datetime import date, datetime, timezone
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
 
 from telethon.tl.types import Message
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=64)
+def _parse_iso_date_str(value: str) -> datetime:
+    """Распарсить ISO-дату из конфига; naive-значения считаются UTC."""
+    parsed_date = datetime.fromisoformat(value)
+    if parsed_date.tzinfo is None:
+        parsed_date = parsed_date.replace(tzinfo=timezone.utc)
+    return parsed_date
+
+
+def _coerce_user_id(value: Any) -> Any:
+    """Привести user_id из конфига к int: "123" в YAML не совпал бы с sender_id."""
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.lstrip("-").isdigit():
+            return int(stripped)
+    return value
+
+
+@lru_cache(maxsize=32)
+def _size_predicate(
+    min_size: Optional[int], max_size: Optional[int]
+) -> Callable[[Optional[int]], bool]:
+    """Собрать проверку размера под конкретные границы (None — граница не задана)."""
+    if min_size is None and max_size is None:
+        return lambda file_size: True
+    # Незаданная граница заменяется значением, которое размер файла не выходит за:
+    # в проверке остаётся одно цепочечное сравнение без ветвлений на None
+    low = min_size if min_size is not None else 0
+    high = max_size if max_size is not None else sys.maxsize
+    return lambda file_size: file_size is None or low <= file_size <= high
+
+
+def _normalize_username(value: Any) -> str:
+    """Привести username к виду для сравнения: без @ и пробелов, casefold."""
+    return sys.intern(str(value).strip().lstrip("@").casefold())
+
+
+def _sender_username(message: Message) -> Optional[str]:
+    """
+    Получить нормализованный username отправителя сообщения.
+
+    Используется уже загруженный message.sender: запросов к API фильтр не делает.
+    Если отправитель не загружен (message.sender is None) или у него нет
+    username, возвращается None — такое сообщение не проходит фильтр по usernames.
+    """
+    username: Optional[str] = getattr(getattr(message, "sender", None), "username", None)
+    if not username:
+        return None
+    return username.casefold()
+
+
 class MediaFilter:
     """Класс для фильтрации медиа по различным критериям."""
 
+    # Только нужное фильтру состояние, без __dict__: атрибуты читаются
+    # для каждого сообщения
+    __slots__ = (
+        "enabled",
+        "user_ids",
+        "usernames",
+        "_any_list",
+        "start_date",
+        "end_date",
+        "_predicate",
+    )
+
     def __init__(self, config: Dict[str, Any]):
         """
         Инициализация MediaFilter.
@@ -20,23 +85,110 @@ class MediaFilter:
         config: Dict[str, Any]
             Конфигурация с настройками фильтров.
         """
-        self.config = config
-        self.sender_filter = config.get("sender_filter", {})
-        self.enabled = self.sender_filter.get("enabled", False)
-        self.user_ids = self.sender_filter.get("user_ids", [])
-        self.usernames = self.sender_filter.get("usernames", [])
-        
-        # Предупреждение если указаны usernames (пока не реализовано)
+        self.reload(config)
+
+    def reload(self, config: Dict[str, Any]) -> None:
+        """
+        Перечитать настройки фильтров из конфигурации.
+
+        Все значения вычисляются здесь один раз; filter_message конфиг не читает,
+        поэтому после изменения настроек на лету нужно вызвать reload.
+
+        Parameters
+        ----------
+        config: Dict[str, Any]
+            Конфигурация с настройками фильтров.
+        """
+        sender_filter = config.get("sender_filter") or {}
+        self.enabled = sender_filter.get("enabled", False)
+        # Множества: проверка отправителя выполняется для каждого сообщения
+        self.user_ids: FrozenSet[Any] = frozenset(
+            _coerce_user_id(user_id) for user_id in sender_filter.get("user_ids") or ()
+        )
+        # Username хранятся нормализованными (без @, casefold): сравнение — один хеш-поиск
+        self.usernames: FrozenSet[str] = frozenset(
+            _normalize_username(username)
+            for username in sender_filter.get("usernames") or ()
+        )
+        self._any_list = bool(self.user_ids or self.usernames)
         if self.enabled and self.usernames and not self.user_ids:
-            logger.warning(
-                "⚠️ Фильтр по usernames пока не реализован! "
-                "Используйте user_ids для фильтрации по отправителю. "
-                "Фильтр по usernames будет проигнорирован."
+            # Раньше фильтр только по usernames игнорировался и пропускал всё
+            logger.info(
+                "Фильтр по usernames включён: сообщения без загруженного отправителя "
+                "или без username не загружаются"
             )
-        
+
         # Преобразование дат из конфига в datetime объекты
         self.start_date = self._parse_date(config.get("start_date"))
         self.end_date = self._parse_date(config.get("end_date"))
+        # Предикат собирается один раз: в нём остаются только включённые проверки
+        self._predicate: Callable[[Message], bool] = self._build_predicate()
+
+    def _build_sender_check(self) -> Optional[Callable[[Message], bool]]:
+        """
+        Собрать проверку отправителя с той же логикой, что should_download_by_sender.
+
+        Returns
+        -------
+        Optional[Callable[[Message], bool]]
+            Функция проверки или None, если фильтр по отправителю пропускает всё.
+        """
+        if not self.enabled:
+            return None
+
+        if not self._any_list:
+            return lambda message: False
+
+        user_ids = self.user_ids
+        usernames = self.usernames
+        if not usernames:
+            def check(message: Message) -> bool:
+                sender = message.sender_id
+                return sender is not None and sender in user_ids
+
+            return check
+
+        def check_with_usernames(message: Message) -> bool:
+            sender = message.sender_id
+            if sender is None:
+                return False
+            if sender in user_ids:
+                return True
+            username = _sender_username(message)
+            return username is not None and username in usernames
+
+        return check_with_usernames
+
+    def _build_predicate(self) -> Callable[[Message], bool]:
+        """
+        Собрать предикат filter_message из включённых фильтров.
+
+        Returns
+        -------
+        Callable[[Message], bool]
+            Функция, возвращающая True для сообщений, которые нужно загрузить.
+        """
+        sender_check = self._build_sender_check()
+        if self.start_date is None and self.end_date is None:
+            if sender_check is None:
+                return lambda message: True
+            return sender_check
+
+        # Границы как POSIX-время, замкнутые в предикате: сравниваются числа, а не
+        # datetime. Отсутствующая граница заменяется бесконечностью: одно
+        # цепочечное сравнение
+        start, end = self.start_date, self.end_date
+        low = start.timestamp() if start is not None else float("-inf")
+        high = end.timestamp() if end is not None else float("inf")
+        if sender_check is None:
+            return lambda message: low <= message.date.timestamp() <= high
+
+        # Сначала дата: два сравнения без обращения к отправителю, а при узком
+        # окне (догрузка последних дней) она отсекает большую часть сообщений
+        def predicate(message: Message) -> bool:
+            return low <= message.date.timestamp() <= high and sender_check(message)
+
+        return predicate
 
     def should_download_by_sender(self, message: Message) -> bool:
         """
@@ -56,7 +208,7 @@ class MediaFilter:
             return True
 
         # Если фильтр включен, но списки пусты, не загружаем ничего
-        if not self.user_ids and not self.usernames:
+        if not self._any_list:
             return False
 
         sender = message.sender_id
@@ -67,15 +219,12 @@ class MediaFilter:
         if self.user_ids and sender in self.user_ids:
             return True
 
-        # ВРЕМЕННОЕ РЕШЕНИЕ: Если указаны только usernames, не фильтровать
-        # Фильтр по username пока не реализован, требует доступа к информации о пользователе
-        # TODO: Реализовать проверку username через message.sender или client.get_entity()
-        if self.usernames and not self.user_ids:
-            # Предупреждение уже показано в __init__
-            # Возвращаем True, чтобы не блокировать все сообщения
-            return True
+        # Проверка по username (отправитель уже загружен Telethon вместе с сообщением)
+        if self.usernames:
+            username = _sender_username(message)
+            if username is not None and username in self.usernames:
+                return True
 
-        # Если есть user_ids но sender не в списке, и usernames игнорируются
         return False
 
     def _parse_date(self, date_val: Any) -> Optional[datetime]:
@@ -93,18 +242,18 @@ class MediaFilter:
             Datetime объект с timezone UTC или None.
         """
         if isinstance(date_val, str) and date_val.strip():
-            parsed_date = datetime.fromisoformat(date_val)
-            if parsed_date.tzinfo is None:
-                parsed_date = parsed_date.replace(tzinfo=timezone.utc)
-            return parsed_date
+            return _parse_iso_date_str(date_val)
         elif isinstance(date_val, date):
             return datetime.combine(
                 date_val, datetime.min.time(), tzinfo=timezone.utc
             )
         return None
 
+    @staticmethod
     def should_download_by_size(
-        self, file_size: Optional[int], min_size: Optional[int] = None, max_size: Optional[int] = None
+        file_size: Optional[int],
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
     ) -> bool:
         """
         Проверить, нужно ли загружать файл по размеру.
@@ -123,16 +272,31 @@ class MediaFilter:
         bool
             True, если файл должен быть загружен, False иначе.
         """
-        if file_size is None:
-            return True
+        return _size_predicate(min_size, max_size)(file_size)
 
-        if min_size is not None and file_size < min_size:
-            return False
+    @staticmethod
+    def make_size_predicate(
+        min_size: Optional[int] = None, max_size: Optional[int] = None
+    ) -> Callable[[Optional[int]], bool]:
+        """
+        Получить проверку размера файла с зафиксированными границами.
 
-        if max_size is not None and file_size > max_size:
-            return False
+        Границы обычно не меняются за сессию: предикат получают один раз и
+        вызывают для каждого файла. Результат для одинаковых границ кешируется.
 
-        return True
+        Parameters
+        ----------
+        min_size: Optional[int]
+            Минимальный размер файла в байтах.
+        max_size: Optional[int]
+            Максимальный размер файла в байтах.
+
+        Returns
+        -------
+        Callable[[Optional[int]], bool]
+            Функция с той же семантикой, что should_download_by_size.
+        """
+        return _size_predicate(min_size, max_size)
 
     def should_download_by_date(
         self, message_date, start_date=None, end_date=None
@@ -154,10 +318,10 @@ class MediaFilter:
         bool
             True, если сообщение должно быть загружено, False иначе.
         """
-        if start_date and message_date < start_date:
+        if start_date is not None and message_date < start_date:
             return False
 
-        if end_date and message_date > end_date:
+        if end_date is not None and message_date > end_date:
             return False
 
         return True
@@ -176,12 +340,42 @@ class MediaFilter:
         bool
             True, если сообщение должно быть загружено, False иначе.
         """
-        # Фильтр по отправителю
-        if not self.should_download_by_sender(message):
-            return False
+        return self._predicate(message)
 
-        # Фильтр по дате (используются предварительно преобразованные datetime объекты)
-        if not self.should_download_by_date(message.date, self.start_date, self.end_date):
-            return False
+    def filter_batch(
+        self,
+        messages: Iterable[Message],
+        on_error: Optional[Callable[[Message, Exception], None]] = None,
+    ) -> List[bool]:
+        """
+        Применить все фильтры к партии сообщений.
 
-        return True
+        Каждое сообщение проверяется ровно один раз.
+
+        Parameters
+        ----------
+        messages: Iterable[Message]
+            Сообщения для фильтрации.
+        on_error: Optional[Callable[[Message, Exception], None]]
+            Обработчик ошибки проверки отдельного сообщения. Если задан,
+            такое сообщение отсеивается (False в маске), а партия
+            обрабатывается дальше; если None — исключение пробрасывается.
+
+        Returns
+        -------
+        List[bool]
+            Маска: True для сообщений, которые должны быть загружены
+            (в порядке входной последовательности, для itertools.compress).
+        """
+        predicate = self._predicate
+        if on_error is None:
+            return list(map(predicate, messages))
+        mask: List[bool] = []
+        for message in messages:
+            try:
+                passed = predicate(message)
+            except Exception as e:  # pylint: disable=broad-except
+                on_error(message, e)
+                passed = False
+            mask.append(passed)
+        return mask
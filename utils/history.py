@@ -2,468 +2,605 @@
 import html
 import json
 import logging
+import mmap
 import os
 import re
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Set, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple, cast
 from urllib.parse import parse_qs, urlparse
 
-from telethon.tl.types import Message, MessageMediaDocument, MessageMediaPhoto
-
+from telethon.tl.types import (
+    DocumentAttributeAudio,
+    DocumentAttributeFilename,
+    DocumentAttributeImageSize,
+    DocumentAttributeVideo,
+    Message,
+    MessageMediaDocument,
+    MessageMediaPhoto,
+)
+
+from utils.file_management import sanitize_filename
 from utils.validation import validate_archive_file
 
+try:  # Необязательная зависимость: сериализация JSONL в C, сразу в UTF-8 байты
+    import orjson
+except ImportError:  # pragma: no cover - orjson не установлен
+    orjson = None  # type: ignore[assignment]
+
 logger = logging.getLogger(__name__)
 
 
-def _archive_chat_id_for_path(chat_id: int) -> int:
-    """ID чата для путей архива: приоритет без минуса (abs)."""
-    return abs(chat_id)
+def _jsonl_line(obj: Dict[str, Any]) -> bytes:
+    """Сериализовать запись архива в строку JSONL (UTF-8, с переводом строки)."""
+    if orjson is not None:
+        try:
+            return cast(bytes, orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE))
+        except TypeError:
+            # Значения, которые orjson не поддерживает (например, int больше 64 бит)
+            pass
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
 
 
-class MessageHistory:
-    """Класс для сохранения истории сообщений."""
+def _json_loads(data: bytes) -> Any:
+    """Разобрать строку JSONL (байты UTF-8): через orjson, если он установлен."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            # orjson строже стандартного json (например, к int больше 64 бит):
+            # окончательное решение о битой строке принимает json
+            pass
+    return json.loads(data)
 
-    def __init__(
-        self,
-        base_directory: str,
-        history_format: str = "json",
-        history_directory: str = "history",
-        config_manager: Optional[Any] = None,
-    ):
-        """
-        Инициализация MessageHistory.
 
-        Parameters
-        ----------
-        base_directory: str
-            Базовая директория для сохранения истории.
-        history_format: str
-            Формат сохранения ('json', 'txt' или 'html').
-        history_directory: str
-            Имя директории для истории внутри базовой директории.
-        config_manager: Optional[Any]
-            Менеджер конфигурации для добавления чатов из ссылок.
-        """
-        self.base_directory = base_directory
-        self.history_format = history_format.lower()
-        self.history_directory = history_directory
-        self.history_path = os.path.join(base_directory, history_directory)
-        os.makedirs(self.history_path, exist_ok=True)
-        self.chats_info: Dict[int, Dict[str, Any]] = {}  # Информация о чатах для индекса
-        self._index_manifest_file = os.path.join(self.history_path, "index.json")
-        self.config_manager = config_manager
-        self._found_chat_ids: Set[int] = set()  # Найденные chat_id из ссылок
+@lru_cache(maxsize=4096)
+def _parse_iso_str(value: str) -> Optional[datetime]:
+    """
+    Распарсить ISO-строку даты.
 
-    def save_message(
-        self,
-        message: Message,
-        chat_id: int,
-        chat_title: Optional[str] = None,
-        downloaded_file_path: Optional[str] = None
-    ) -> None:
-        """
-        Сохранить одно сообщение.
+    Результат кешируется: одни и те же даты из манифеста разбираются многократно.
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
 
-        Parameters
-        ----------
-        message: Message
-            Сообщение для сохранения.
-        chat_id: int
-            ID чата.
-        chat_title: Optional[str]
-            Название чата.
-        downloaded_file_path: Optional[str]
-            Путь к скачанному файлу (если был скачан).
-        """
-        # Сохранить информацию о чате
-        if chat_id not in self.chats_info:
-            self.chats_info[chat_id] = {
-                "title": chat_title or f"Chat {chat_id}",
-                "message_count": 0,
-                "last_message_date": None
-            }
 
-        self.chats_info[chat_id]["message_count"] += 1
-        if message.date:
-            self.chats_info[chat_id]["last_message_date"] = message.date
+# Сколько чатов держать в кэше разобранных записей JSONL для генерации HTML (LRU)
+_CHAT_RECORDS_CACHE_SIZE = 4
 
-        if self.history_format in ("json", "jsonl"):
-            self._save_json(message, chat_id, chat_title, downloaded_file_path)
-        elif self.history_format == "html":
-            self._save_html_message(message, chat_id, chat_title, downloaded_file_path)
-        else:
-            self._save_txt(message, chat_id, chat_title, downloaded_file_path)
+# Ключ "id" записи JSONL: перед ним кавычка, поэтому "reply_to_msg_id" и
+# экранированный текст (\"id\") не совпадают
+_ARCHIVE_ID_RE = re.compile(rb'"id":\s*(-?\d+)')
 
-    def _save_json(
-        self,
-        message: Message,
-        chat_id: int,
-        chat_title: Optional[str],
-        downloaded_file_path: Optional[str] = None
-    ) -> None:
-        """
-        Сохранить сообщение в JSON формате.
 
-        Parameters
-        ----------
-        message: Message
-            Сообщение для сохранения.
-        chat_id: int
-            ID чата.
-        chat_title: Optional[str]
-            Название чата.
-        downloaded_file_path: Optional[str]
-            Путь к скачанному файлу.
-        """
-        chat_file = os.path.join(self.history_path, f"chat_{_archive_chat_id_for_path(chat_id)}.jsonl")
-        message_data: Dict[str, Any] = {
-            "id": message.id,
-            "date": message.date.isoformat() if message.date else None,
-            "text": message.message or "",
-            "sender_id": message.sender_id,
-            "chat_id": chat_id,
-            "chat_title": chat_title,
-            "has_media": bool(message.media),
-            "views": getattr(message, "views", None),
-            "forwards": getattr(message, "forwards", None),
-            "reply_to_msg_id": message.reply_to_msg_id if message.reply_to else None,
-            "edit_date": message.edit_date.isoformat() if message.edit_date else None,
-        }
+# Сведения о классе entity: (имя типа, есть ли url, есть ли user_id).
+# У объектов Telethon набор полей определяется классом, поэтому проверяется один раз
+_ENTITY_FIELDS: Dict[type, Tuple[str, bool, bool]] = {}
 
-        # Добавить информацию о медиа, если есть
-        if message.media:
-            media_info = self._extract_media_info(message)
-            message_data.update(media_info)
 
-        # Добавить путь к скачанному файлу
-        if downloaded_file_path:
-            message_data["downloaded_file"] = downloaded_file_path
+def _entity_dict(entity: Any) -> Dict[str, Any]:
+    """Собрать запись entity (форматирование, ссылки) для JSONL архива."""
+    cls = type(entity)
+    fields = _ENTITY_FIELDS.get(cls)
+    if fields is None:
+        fields = _ENTITY_FIELDS[cls] = (
+            cls.__name__,
+            hasattr(entity, "url"),
+            hasattr(entity, "user_id"),
+        )
+    entity_type, has_url, has_user_id = fields
+    entity_dict: Dict[str, Any] = {
+        "offset": entity.offset,
+        "length": entity.length,
+        "type": entity_type,
+    }
+    # Для MessageEntityTextUrl сохранить URL
+    if has_url:
+        entity_dict["url"] = entity.url
+    # Для MessageEntityMentionName сохранить user_id
+    if has_user_id:
+        entity_dict["user_id"] = entity.user_id
+    return entity_dict
 
-        with open(chat_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(message_data, ensure_ascii=False) + "\n")
 
-    def _sanitize_filename(self, filename: str) -> str:
-        """
-        Очистить имя файла от недопустимых символов для Windows.
+def _archive_chat_id_for_path(chat_id: int) -> int:
+    """ID чата для путей архива: приоритет без минуса (abs)."""
+    return abs(chat_id)
 
-        Parameters
-        ----------
-        filename: str
-            Исходное имя файла.
 
-        Returns
-        -------
-        str
-            Безопасное имя файла.
-        """
-        # Недопустимые символы в Windows: < > : " / \ | ? *
-        replacements = {
-            ':': '-',
-            '<': '_',
-            '>': '_',
-            '"': "'",
-            '/': '_',
-            '\\': '_',
-            '|': '_',
-            '?': '_',
-            '*': '_',
+# Стили страницы чата: статичная строка, не форматируется при каждой генерации HTML
+_CSS_BLOCK = """\
+    <style>
+        :root {
+            --bg-color: #0f0f0f;
+            --chat-bg: #212121;
+            --message-bg: #2b2b2b;
+            --text-color: #e4e4e4;
+            --text-secondary: #8e8e93;
+            --accent-color: #8774e1;
+            --header-bg: #17212b;
+            --border-color: #2f2f2f;
         }
 
-        for char, replacement in replacements.items():
-            filename = filename.replace(char, replacement)
+        [data-theme="light"] {
+            --bg-color: #f4f4f5;
+            --chat-bg: #ffffff;
+            --message-bg: #ffffff;
+            --text-color: #000000;
+            --text-secondary: #707579;
+            --accent-color: #3390ec;
+            --header-bg: #ffffff;
+            --border-color: #e4e4e5;
+        }
 
-        return filename
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
 
-    def _save_txt(
-        self,
-        message: Message,
-        chat_id: int,
-        chat_title: Optional[str],
-        downloaded_file_path: Optional[str] = None
-    ) -> None:
-        """
-        Сохранить сообщение в текстовом формате.
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+            background: var(--bg-color);
+            color: var(--text-color);
+            min-height: 100vh;
+        }
 
-        Parameters
-        ----------
-        message: Message
-            Сообщение для сохранения.
-        chat_id: int
-            ID чата.
-        chat_title: Optional[str]
-            Название чата.
-        downloaded_file_path: Optional[str]
-            Путь к скачанному файлу.
-        """
-        chat_file = os.path.join(self.history_path, f"chat_{_archive_chat_id_for_path(chat_id)}.txt")
-        date_str = message.date.strftime("%Y-%m-%d %H-%M-%S") if message.date else "Unknown"
-        text = message.message or "[Без текста]"
-        media_info = ""
+        .container {
+            max-width: 900px;
+            margin: 0 auto;
+            background: var(--chat-bg);
+            min-height: 100vh;
+            display: flex;
+            flex-direction: column;
+        }
 
-        if message.media:
-            media_type = self._get_media_type(message)
-            media_details = self._extract_media_info(message)
-            media_info = f" [Медиа: {media_type}"
-            if media_details.get("file_name"):
-                media_info += f", файл: {media_details['file_name']}"
-            media_info += "]"
+        .header {
+            background: var(--header-bg);
+            border-bottom: 1px solid var(--border-color);
+            padding: 12px 20px;
+            display: flex;
+            align-items: center;
+            justify-content: space-between;
+            position: sticky;
+            top: 0;
+            z-index: 100;
+            backdrop-filter: blur(10px);
+        }
 
-        file_info = ""
-        if downloaded_file_path:
-            file_info = f"\n  Скачано: {downloaded_file_path}"
+        .header-left {
+            display: flex;
+            align-items: center;
+            gap: 12px;
+        }
 
-        with open(chat_file, "a", encoding="utf-8") as f:
-            f.write(f"[{date_str}] ID:{message.id} {text}{media_info}{file_info}\n")
+        .back-btn {
+            color: var(--text-color);
+            text-decoration: none;
+            font-size: 24px;
+            transition: opacity 0.2s;
+        }
 
-    def _get_media_type(self, message: Message) -> str:
-        """
-        Определить тип медиа в сообщении.
+        .back-btn:hover {
+            opacity: 0.7;
+        }
 
-        Parameters
-        ----------
-        message: Message
-            Сообщение.
+        .chat-info {
+            display: flex;
+            flex-direction: column;
+        }
 
-        Returns
-        -------
-        str
-            Тип медиа.
-        """
-        if not message.media:
-            return "None"
+        .chat-title {
+            font-size: 15px;
+            font-weight: 500;
+            color: var(--text-color);
+        }
 
-        if isinstance(message.media, MessageMediaPhoto):
-            return "photo"
+        .chat-subtitle {
+            font-size: 13px;
+            color: var(--text-secondary);
+        }
 
-        if isinstance(message.media, MessageMediaDocument):
-            doc = message.media.document
-            for attr in doc.attributes:
-                if hasattr(attr, "voice") and isinstance(attr.voice, bool):
-                    return "voice" if attr.voice else "audio"
-                if hasattr(attr, "round_message") and isinstance(attr.round_message, bool):
-                    return "video_note" if attr.round_message else "video"
-            return "document"
+        .theme-toggle {
+            background: none;
+            border: none;
+            font-size: 24px;
+            cursor: pointer;
+            padding: 8px;
+            transition: transform 0.2s;
+        }
 
-        # Упрощенная проверка для остальных типов
-        media_type = str(type(message.media).__name__)
-        return media_type.replace("MessageMedia", "").lower()
+        .theme-toggle:hover {
+            transform: scale(1.1);
+        }
 
-    def _extract_media_info(self, message: Message) -> Dict[str, Any]:
-        """
-        Извлечь детальную информацию о медиа.
+        .search-box {
+            padding: 12px 20px;
+            background: var(--chat-bg);
+            border-bottom: 1px solid var(--border-color);
+            position: sticky;
+            top: 60px;
+            z-index: 99;
+            backdrop-filter: blur(10px);
+        }
 
-        Parameters
-        ----------
-        message: Message
-            Сообщение.
+        .search-box input {
+            width: 100%;
+            padding: 10px 16px;
+            border: 1px solid var(--border-color);
+            border-radius: 20px;
+            font-size: 14px;
+            background: var(--message-bg);
+            color: var(--text-color);
+            transition: border-color 0.2s;
+        }
 
-        Returns
-        -------
-        Dict[str, Any]
-            Словарь с информацией о медиа.
-        """
-        media_info: Dict[str, Any] = {
-            "media_type": self._get_media_type(message)
+        .search-box input:focus {
+            outline: none;
+            border-color: var(--accent-color);
         }
 
-        if isinstance(message.media, MessageMediaPhoto):
-            photo = message.media.photo
-            if photo:
-                media_info["photo_id"] = photo.id
-                # У Telethon у фото обычно нет `size`, есть `sizes`.
-                # Не сохраняем null в JSONL: если размер нельзя получить — просто не пишем поле.
-                photo_size = self._get_photo_file_size(photo)
-                if photo_size is not None:
-                    media_info["file_size"] = photo_size
+        .messages {
+            flex: 1;
+            padding: 20px;
+            overflow-y: auto;
+            display: flex;
+            flex-direction: column;
+            gap: 8px;
+        }
 
-        elif isinstance(message.media, MessageMediaDocument):
-            doc = message.media.document
-            if doc:
-                media_info["document_id"] = doc.id
-                media_info["file_size"] = doc.size
-                media_info["mime_type"] = doc.mime_type
-
-                # Извлечь имя файла и другие атрибуты
-                for attr in doc.attributes:
-                    if hasattr(attr, "file_name"):
-                        media_info["file_name"] = attr.file_name
-                    if hasattr(attr, "duration"):
-                        media_info["duration"] = attr.duration
-                    if hasattr(attr, "w") and hasattr(attr, "h"):
-                        media_info["width"] = attr.w
-                        media_info["height"] = attr.h
-
-        return media_info
+        .message-bubble {
+            max-width: 70%;
+            background: var(--message-bg);
+            border-radius: 12px;
+            padding: 8px 12px;
+            position: relative;
+            box-shadow: 0 1px 2px rgba(0,0,0,0.1);
+            animation: fadeIn 0.2s ease-in;
+            align-self: flex-start;
+        }
 
-    @staticmethod
-    def _coerce_file_size(value: Any) -> int:
-        """
-        Нормализовать размер файла из JSONL.
+        @keyframes fadeIn {
+            from { opacity: 0; transform: translateY(10px); }
+            to { opacity: 1; transform: translateY(0); }
+        }
 
-        В JSONL `file_size` может быть `null` (None) или не-int (например, строкой).
-        Для UI/HTML это не критично — возвращаем 0, чтобы форматирование не падало.
-        """
-        if value is None:
-            return 0
-        if isinstance(value, bool):
-            return 0
-        if isinstance(value, int):
-            return value
-        try:
-            return int(value)
-        except (TypeError, ValueError):
-            return 0
+        .message-reply {
+            background: var(--accent-color);
+            background: linear-gradient(90deg, var(--accent-color) 3px, transparent 3px);
+            padding: 6px 10px;
+            padding-left: 14px;
+            border-radius: 6px;
+            font-size: 13px;
+            color: var(--text-secondary);
+            margin-bottom: 6px;
+        }
 
-    @staticmethod
-    def _get_photo_file_size(photo: Any) -> Optional[int]:
-        """
-        Попробовать получить размер фото (в байтах) из Telethon объекта.
+        .message-text {
+            font-size: 15px;
+            line-height: 1.5;
+            word-wrap: break-word;
+            white-space: pre-wrap;
+            margin: 4px 0;
+        }
 
-        У фото размер часто доступен только на уровне `sizes[*].size` или `len(sizes[*].bytes)`.
-        Возвращаем максимальный известный размер или None.
-        """
-        sizes = getattr(photo, "sizes", None)
-        if not sizes:
-            return None
+        .message-link {
+            color: var(--accent-color);
+            text-decoration: none;
+        }
 
-        max_size = 0
-        for s in sizes:
-            s_size = getattr(s, "size", None)
-            if isinstance(s_size, int) and s_size > max_size:
-                max_size = s_size
-                continue
+        .message-link:hover {
+            text-decoration: underline;
+        }
 
-            s_bytes = getattr(s, "bytes", None)
-            if isinstance(s_bytes, (bytes, bytearray)):
-                max_size = max(max_size, len(s_bytes))
+        .message-hashtag {
+            color: var(--accent-color);
+        }
 
-        return max_size if max_size > 0 else None
+        .message-spoiler {
+            background: var(--text-color);
+            color: var(--text-color);
+            cursor: pointer;
+            user-select: none;
+            transition: background 0.2s, color 0.2s;
+        }
 
-    def _check_archive_duplicates(
-        self, archive_path: str, message_ids: List[int], fmt: str
-    ) -> bool:
-        """
-        Проверить, есть ли все сообщения уже в архиве (проверка дублей).
+        .message-spoiler.revealed {
+            background: transparent;
+            color: var(--text-color);
+        }
 
-        Parameters
-        ----------
-        archive_path: str
-            Путь к архиву.
-        message_ids: List[int]
-            Список ID сообщений для проверки.
-        fmt: str
-            Формат архива ("jsonl" или "txt").
+        .message-text code {
+            background: var(--border-color);
+            padding: 2px 4px;
+            border-radius: 4px;
+            font-family: 'Courier New', monospace;
+            font-size: 0.9em;
+        }
 
-        Returns
-        -------
-        bool
-            True, если все сообщения уже есть в архиве (можно пропустить сохранение).
-        """
-        if not os.path.exists(archive_path):
-            return False
+        .message-text pre {
+            background: var(--border-color);
+            padding: 8px;
+            border-radius: 4px;
+            overflow-x: auto;
+            font-family: 'Courier New', monospace;
+            font-size: 0.9em;
+        }
 
-        # Проверить валидность архива
-        if not validate_archive_file(archive_path, fmt):
-            return False
+        .message-text blockquote {
+            border-left: 3px solid var(--accent-color);
+            padding-left: 12px;
+            margin: 4px 0;
+            color: var(--text-secondary);
+        }
 
-        if not message_ids:
-            return True
+        .media-preview {
+            margin: 4px 0;
+            border-radius: 8px;
+            overflow: hidden;
+            max-width: 100%;
+        }
 
-        # Для JSONL: проверить наличие всех ID
-        if fmt == "jsonl":
-            existing_ids: set = set()
-            try:
-                with open(archive_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            obj = json.loads(line)
-                            if isinstance(obj, dict) and "id" in obj:
-                                existing_ids.add(obj["id"])
-                        except Exception:
-                            continue
-            except Exception:
-                return False
+        .photo-preview img {
+            display: block;
+            max-width: 100%;
+            max-height: 500px;
+            width: auto;
+            height: auto;
+            border-radius: 8px;
+            cursor: pointer;
+            transition: transform 0.2s;
+        }
 
-            # Если все ID уже есть в архиве - дубли
-            return all(msg_id in existing_ids for msg_id in message_ids)
+        .photo-preview img:hover {
+            transform: scale(1.02);
+        }
 
-        # Для TXT: не можем точно проверить, считаем что нужно сохранить
-        return False
+        .video-preview {
+            position: relative;
+        }
+
+        .video-preview video {
+            display: block;
+            max-width: 100%;
+            max-height: 500px;
+            width: auto;
+            border-radius: 8px;
+        }
+
+        .video-duration {
+            position: absolute;
+            bottom: 8px;
+            right: 8px;
+            background: rgba(0,0,0,0.7);
+            color: white;
+            padding: 2px 6px;
+            border-radius: 4px;
+            font-size: 12px;
+            font-weight: 500;
+        }
+
+        .media-file {
+            background: var(--message-bg);
+            border: 1px solid var(--border-color);
+            border-radius: 8px;
+            margin: 4px 0;
+        }
+
+        .file-download {
+            display: flex;
+            align-items: center;
+            gap: 12px;
+            padding: 12px;
+            text-decoration: none;
+            color: var(--text-color);
+            transition: background 0.2s;
+        }
+
+        .file-download:hover {
+            background: var(--border-color);
+        }
+
+        .file-icon {
+            font-size: 32px;
+            flex-shrink: 0;
+        }
+
+        .file-info {
+            flex: 1;
+            min-width: 0;
+        }
+
+        .file-name {
+            font-size: 14px;
+            font-weight: 500;
+            overflow: hidden;
+            text-overflow: ellipsis;
+            white-space: nowrap;
+        }
+
+        .file-size {
+            font-size: 13px;
+            color: var(--text-secondary);
+            margin-top: 2px;
+        }
+
+        .download-icon {
+            font-size: 20px;
+            flex-shrink: 0;
+        }
+
+        .not-downloaded {
+            opacity: 0.6;
+        }
+
+        .media-error {
+            padding: 20px;
+            text-align: center;
+            background: var(--border-color);
+            border-radius: 8px;
+            color: var(--text-secondary);
+        }
+
+        .message-footer {
+            display: flex;
+            align-items: center;
+            justify-content: flex-end;
+            gap: 6px;
+            margin-top: 4px;
+            font-size: 12px;
+            color: var(--text-secondary);
+        }
+
+        .message-time {
+            font-size: 11px;
+        }
+
+        .message-meta {
+            display: flex;
+            align-items: center;
+            gap: 6px;
+        }
+
+        .meta-views, .meta-forwards {
+            display: flex;
+            align-items: center;
+            gap: 2px;
+        }
+
+        .meta-edited {
+            font-style: italic;
+            font-size: 11px;
+        }
+
+        .empty-state {
+            text-align: center;
+            padding: 60px 20px;
+            color: var(--text-secondary);
+        }
+
+        @media (max-width: 768px) {
+            .message-bubble {
+                max-width: 85%;
+            }
+        }
+    </style>"""
+
+
+class MessageHistory:  # pylint: disable=too-many-instance-attributes
+    """Класс для сохранения истории сообщений."""
+
+    def __init__(
+        self,
+        base_directory: str,
+        history_format: str = "json",
+        history_directory: str = "history",
+        config_manager: Optional[Any] = None,
+    ):
+        """
+        Инициализация MessageHistory.
+
+        Parameters
+        ----------
+        base_directory: str
+            Базовая директория для сохранения истории.
+        history_format: str
+            Формат сохранения ('json', 'txt' или 'html').
+        history_directory: str
+            Имя директории для истории внутри базовой директории.
+        config_manager: Optional[Any]
+            Менеджер конфигурации для добавления чатов из ссылок.
+        """
+        self.base_directory = base_directory
+        self.history_format = history_format.lower()
+        self.history_directory = history_directory
+        self.history_path = os.path.join(base_directory, history_directory)
+        os.makedirs(self.history_path, exist_ok=True)
+        self.chats_info: Dict[int, Dict[str, Any]] = {}  # Информация о чатах для индекса
+        self._index_manifest_file = os.path.join(self.history_path, "index.json")
+        self.config_manager = config_manager
+        self._found_chat_ids: Set[int] = set()  # Найденные chat_id из ссылок
+        # ID сообщений в JSONL архивах: путь -> ((mtime_ns, размер), ID)
+        self._archive_ids: Dict[str, Tuple[Tuple[int, int], Set[Any]]] = {}
+        # Разобранные записи JSONL для HTML: путь -> ((mtime_ns, размер), записи).
+        # Заполняется при генерации HTML и дополняется при записи пакета,
+        # чтобы не перечитывать весь архив после каждого пакета. LRU на
+        # _CHAT_RECORDS_CACHE_SIZE чатов: в памяти только недавно обработанные архивы
+        self._chat_records: (
+            "OrderedDict[str, Tuple[Tuple[int, int], List[Dict[str, Any]]]]"
+        ) = OrderedDict()
+        # Наибольший записанный ID в JSONL архивах:
+        # имя файла -> [mtime_ns, размер, max_id]. Сохраняется между запусками
+        # в archive_meta.json; загружается при первом обращении
+        self._archive_meta_file = os.path.join(self.history_path, "archive_meta.json")
+        self._archive_max_ids: Optional[Dict[str, List[int]]] = None
+        # Отметки изменены, но ещё не записаны: файл пишется один раз на пакет
+        self._archive_meta_dirty = False
 
-    def save_batch(
+    def save_message(
         self,
-        messages: List[Message],
+        message: Message,
         chat_id: int,
         chat_title: Optional[str] = None,
-        downloaded_files: Optional[Dict[int, str]] = None,
+        downloaded_file_path: Optional[str] = None
     ) -> None:
         """
-        Сохранить пакет сообщений.
+        Сохранить одно сообщение.
 
         Parameters
         ----------
-        messages: List[Message]
-            Список сообщений для сохранения.
+        message: Message
+            Сообщение для сохранения.
         chat_id: int
             ID чата.
         chat_title: Optional[str]
             Название чата.
-        downloaded_files: Optional[Dict[int, str]]
-            Словарь {message_id: file_path} для скачанных файлов.
+        downloaded_file_path: Optional[str]
+            Путь к скачанному файлу (если был скачан).
         """
-        downloaded_files = downloaded_files or {}
-        ext = "txt" if self.history_format == "txt" else "jsonl"
-        path_id = _archive_chat_id_for_path(chat_id)
-        archive_path = os.path.join(self.history_path, f"chat_{path_id}.{ext}")
+        self._update_chat_info(chat_id, chat_title, 1, message.date)
 
-        # Проверка дублей: если все сообщения уже есть в архиве, пропустить сохранение
-        message_ids = [msg.id for msg in messages]
-        if self._check_archive_duplicates(archive_path, message_ids, ext):
-            logger.info(
-                "Архив чата уже содержит все сообщения: chat_id=%s, path=%s, сообщений=%s (пропуск сохранения)",
-                chat_id,
-                archive_path,
-                len(messages),
-            )
-            # Всё равно обновить индекс HTML, если нужно
-            if self.history_format == "html":
-                self._generate_index_html()
-            return
+        if self.history_format in ("json", "jsonl"):
+            self._save_json(message, chat_id, chat_title, downloaded_file_path)
+        elif self.history_format == "html":
+            self._save_html_message(message, chat_id, chat_title, downloaded_file_path)
+        else:
+            self._save_txt(message, chat_id, chat_title, downloaded_file_path)
 
-        logger.info(
-            "Сохранение архива чата: chat_id=%s, path=%s, сообщений=%s",
-            chat_id,
-            archive_path,
-            len(messages),
-        )
-        for message in messages:
-            file_path = downloaded_files.get(message.id)
-            self.save_message(message, chat_id, chat_title, file_path)
-        logger.info(
-            "Архив чата сохранён: chat_id=%s, path=%s",
+    def _update_chat_info(
+        self,
+        chat_id: int,
+        chat_title: Optional[str],
+        count: int = 1,
+        last_date: Optional[datetime] = None,
+    ) -> None:
+        """Учесть сообщения (одно или пакет) в информации о чате для индекса."""
+        info = self.chats_info.setdefault(
             chat_id,
-            archive_path,
+            {
+                "title": chat_title or f"Chat {chat_id}",
+                "message_count": 0,
+                "last_message_date": None,
+            },
         )
+        info["message_count"] += count
+        if last_date:
+            info["last_message_date"] = last_date
 
-        # Добавить найденные чаты из ссылок в список загрузок
-        self._add_found_chats_to_config()
-
-        # Создать/обновить индексный HTML файл после сохранения пакета
-        if self.history_format == "html":
-            self._generate_index_html()
-
-    def _save_html_message(
+    def _build_message_dict(
         self,
         message: Message,
         chat_id: int,
         chat_title: Optional[str],
-        downloaded_file_path: Optional[str] = None
-    ) -> None:
+        downloaded_file_path: Optional[str] = None,
+        *,
+        include_entities: bool = False,
+    ) -> Dict[str, Any]:
         """
-        Сохранить сообщение в HTML (буферизация).
+        Собрать запись сообщения для JSONL архива (форматы json и html).
 
         Parameters
         ----------
@@ -475,498 +612,774 @@ class MessageHistory:
             Название чата.
         downloaded_file_path: Optional[str]
             Путь к скачанному файлу.
+        include_entities: bool
+            Сохранить entities (форматирование, ссылки) — нужно для HTML формата.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Словарь для сериализации в одну строку JSONL.
         """
-        # Сохраняем в JSON для последующей генерации HTML (путь без минуса)
-        chat_file = os.path.join(self.history_path, f"chat_{_archive_chat_id_for_path(chat_id)}.jsonl")
+        # Атрибуты, которые нужны и для проверки, и для значения, читаются один раз
+        msg_date = message.date
+        edit_date = message.edit_date
+        media = message.media
         message_data: Dict[str, Any] = {
             "id": message.id,
-            "date": message.date.isoformat() if message.date else None,
+            "date": msg_date.isoformat() if msg_date else None,
             "text": message.message or "",
             "sender_id": message.sender_id,
             "chat_id": chat_id,
             "chat_title": chat_title,
-            "has_media": bool(message.media),
+            "has_media": bool(media),
             "views": getattr(message, "views", None),
             "forwards": getattr(message, "forwards", None),
             "reply_to_msg_id": message.reply_to_msg_id if message.reply_to else None,
-            "edit_date": message.edit_date.isoformat() if message.edit_date else None,
+            "edit_date": edit_date.isoformat() if edit_date else None,
         }
 
         # Сохранить entities (форматирование текста, ссылки)
-        if hasattr(message, "entities") and message.entities:
-            entities_data = []
-            for entity in message.entities:
-                entity_dict = {
-                    "offset": entity.offset,
-                    "length": entity.length,
-                }
-                # Сохранить тип entity
-                entity_type = type(entity).__name__
-                entity_dict["type"] = entity_type
-                
-                # Для MessageEntityTextUrl сохранить URL
-                if hasattr(entity, "url"):
-                    entity_dict["url"] = entity.url
-                
-                # Для MessageEntityMentionName сохранить user_id
-                if hasattr(entity, "user_id"):
-                    entity_dict["user_id"] = entity.user_id
-                
-                entities_data.append(entity_dict)
-            message_data["entities"] = entities_data
+        if include_entities:
+            entities = getattr(message, "entities", None)
+            if entities:
+                message_data["entities"] = [_entity_dict(entity) for entity in entities]
 
-        if message.media:
+        # Добавить информацию о медиа, если есть
+        if media:
             media_info = self._extract_media_info(message)
             message_data.update(media_info)
 
+        # Добавить путь к скачанному файлу
         if downloaded_file_path:
             message_data["downloaded_file"] = downloaded_file_path
 
-        with open(chat_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(message_data, ensure_ascii=False) + "\n")
+        return message_data
 
-    def _generate_chat_html(self, chat_id: int) -> None:
+    def _save_json(
+        self,
+        message: Message,
+        chat_id: int,
+        chat_title: Optional[str],
+        downloaded_file_path: Optional[str] = None
+    ) -> None:
         """
-        Сгенерировать HTML файл для конкретного чата.
+        Сохранить сообщение в JSON формате.
 
         Parameters
         ----------
+        message: Message
+            Сообщение для сохранения.
         chat_id: int
             ID чата.
+        chat_title: Optional[str]
+            Название чата.
+        downloaded_file_path: Optional[str]
+            Путь к скачанному файлу.
         """
-        path_id = _archive_chat_id_for_path(chat_id)
-        jsonl_file = os.path.join(self.history_path, f"chat_{path_id}.jsonl")
-        if not os.path.exists(jsonl_file):
-            return
+        chat_file = os.path.join(self.history_path, f"chat_{_archive_chat_id_for_path(chat_id)}.jsonl")
+        message_data = self._build_message_dict(
+            message, chat_id, chat_title, downloaded_file_path
+        )
+        self._append_lines(chat_file, [_jsonl_line(message_data)])
 
-        messages: List[Dict[str, Any]] = []
-        with open(jsonl_file, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    # JSONL может быть частично записан (например, при аварийном завершении).
-                    # Генерация HTML не должна падать из-за одной битой строки.
-                    continue
-                if isinstance(obj, dict):
-                    messages.append(obj)
+    @staticmethod
+    def _append_lines(chat_file: str, lines: List[bytes]) -> None:
+        """
+        Дописать готовые строки в файл архива.
 
-        if not messages:
-            return
+        Файл открывается один раз на вызов и закрывается сразу: архив читается
+        другими частями программы (проверка дублей, поиск файлов, HTML),
+        поэтому данные не должны оставаться в буфере между пакетами.
 
-        # Использовать 'or' вместо default, чтобы обработать None значения
-        chat_title = messages[0].get("chat_title") or f"Чат {chat_id}"
-        html_file = os.path.join(self.history_path, f"chat_{path_id}.html")
+        Parameters
+        ----------
+        chat_file: str
+            Путь к файлу архива.
+        lines: List[bytes]
+            Строки в UTF-8 с завершающим переводом строки.
+        """
+        with open(chat_file, "ab") as f:
+            # Строки копируются в буфер файла без промежуточного объединения всего пакета
+            f.writelines(lines)
 
-        html_content = self._get_html_template(chat_title, messages)
+    def _sanitize_filename(self, filename: str) -> str:
+        """
+        Очистить имя файла от недопустимых символов для Windows.
 
-        with open(html_file, "w", encoding="utf-8") as f:
-            f.write(html_content)
+        Parameters
+        ----------
+        filename: str
+            Исходное имя файла.
 
-    def _get_html_template(self, chat_title: str, messages: List[Dict[str, Any]]) -> str:
+        Returns
+        -------
+        str
+            Безопасное имя файла.
         """
-        Создать HTML шаблон для чата.
+        return sanitize_filename(filename)
+
+    def _save_txt(
+        self,
+        message: Message,
+        chat_id: int,
+        chat_title: Optional[str],
+        downloaded_file_path: Optional[str] = None
+    ) -> None:
+        """
+        Сохранить сообщение в текстовом формате.
 
         Parameters
         ----------
-        chat_title: str
+        message: Message
+            Сообщение для сохранения.
+        chat_id: int
+            ID чата.
+        chat_title: Optional[str]
             Название чата.
-        messages: List[Dict[str, Any]]
-            Список сообщений.
+        downloaded_file_path: Optional[str]
+            Путь к скачанному файлу.
+        """
+        chat_file = os.path.join(self.history_path, f"chat_{_archive_chat_id_for_path(chat_id)}.txt")
+        self._append_lines(
+            chat_file,
+            [self._format_txt_line(message, downloaded_file_path).encode("utf-8")],
+        )
+
+    def _format_txt_line(
+        self, message: Message, downloaded_file_path: Optional[str] = None
+    ) -> str:
+        """
+        Сформировать запись сообщения для текстового архива.
+
+        Parameters
+        ----------
+        message: Message
+            Сообщение для сохранения.
+        downloaded_file_path: Optional[str]
+            Путь к скачанному файлу.
 
         Returns
         -------
         str
-            HTML контент.
+            Запись с завершающим переводом строки.
         """
-        messages_html = ""
-        for msg in messages:
-            messages_html += self._format_message_html(msg)
+        date_str = message.date.strftime("%Y-%m-%d %H-%M-%S") if message.date else "Unknown"
+        text = message.message or "[Без текста]"
+        media_info = ""
 
-        return f"""<!DOCTYPE html>
-<html lang="ru">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{html.escape(chat_title)}</title>
-    <style>
-        :root {{
-            --bg-color: #0f0f0f;
-            --chat-bg: #212121;
-            --message-bg: #2b2b2b;
-            --text-color: #e4e4e4;
-            --text-secondary: #8e8e93;
-            --accent-color: #8774e1;
-            --header-bg: #17212b;
-            --border-color: #2f2f2f;
-        }}
+        if message.media:
+            media_type, media_details = self._classify_media(message)
+            media_info = f" [Медиа: {media_type}"
+            if media_details.get("file_name"):
+                media_info += f", файл: {media_details['file_name']}"
+            media_info += "]"
 
-        [data-theme="light"] {{
-            --bg-color: #f4f4f5;
-            --chat-bg: #ffffff;
-            --message-bg: #ffffff;
-            --text-color: #000000;
-            --text-secondary: #707579;
-            --accent-color: #3390ec;
-            --header-bg: #ffffff;
-            --border-color: #e4e4e5;
-        }}
+        file_info = ""
+        if downloaded_file_path:
+            file_info = f"\n  Скачано: {downloaded_file_path}"
+
+        return f"[{date_str}] ID:{message.id} {text}{media_info}{file_info}\n"
+
+    def _get_media_type(self, message: Message) -> str:
+        """
+        Определить тип медиа в сообщении.
+
+        Parameters
+        ----------
+        message: Message
+            Сообщение.
+
+        Returns
+        -------
+        str
+            Тип медиа.
+        """
+        return self._classify_media(message)[0]
+
+    def _extract_media_info(self, message: Message) -> Dict[str, Any]:
+        """
+        Извлечь детальную информацию о медиа.
+
+        Parameters
+        ----------
+        message: Message
+            Сообщение.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Словарь с информацией о медиа.
+        """
+        return self._classify_media(message)[1]
+
+    def _classify_media(self, message: Message) -> Tuple[str, Dict[str, Any]]:
+        """
+        Определить тип медиа и извлечь информацию о нём за один проход по атрибутам.
+
+        Parameters
+        ----------
+        message: Message
+            Сообщение.
+
+        Returns
+        -------
+        Tuple[str, Dict[str, Any]]
+            Тип медиа и словарь с информацией о медиа (включая "media_type").
+        """
+        media = message.media
+        if not media:
+            return "None", {"media_type": "None"}
+
+        # Ключ "media_type" добавляется первым, чтобы сохранить порядок полей в JSONL
+        media_info: Dict[str, Any] = {"media_type": None}
+        media_type: Optional[str] = None
+
+        if isinstance(media, MessageMediaPhoto):
+            media_type = "photo"
+            photo = media.photo
+            if photo:
+                media_info["photo_id"] = photo.id
+                # У Telethon у фото обычно нет `size`, есть `sizes`.
+                # Не сохраняем null в JSONL: если размер нельзя получить — просто не пишем поле.
+                photo_size = self._get_photo_file_size(photo)
+                if photo_size is not None:
+                    media_info["file_size"] = photo_size
 
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
+        elif isinstance(media, MessageMediaDocument):
+            doc = media.document
+            media_type = self._document_info(doc, media_info) if doc else "document"
 
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-            background: var(--bg-color);
-            color: var(--text-color);
-            min-height: 100vh;
-        }}
+        else:
+            # Упрощенная проверка для остальных типов
+            media_type = type(media).__name__.replace("MessageMedia", "").lower()
 
-        .container {{
-            max-width: 900px;
-            margin: 0 auto;
-            background: var(--chat-bg);
-            min-height: 100vh;
-            display: flex;
-            flex-direction: column;
-        }}
+        media_info["media_type"] = media_type
+        return media_type, media_info
 
-        .header {{
-            background: var(--header-bg);
-            border-bottom: 1px solid var(--border-color);
-            padding: 12px 20px;
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            position: sticky;
-            top: 0;
-            z-index: 100;
-            backdrop-filter: blur(10px);
-        }}
+    @staticmethod
+    def _document_info(doc: Any, media_info: Dict[str, Any]) -> str:
+        """
+        Дополнить сведения о медиа данными документа и определить его тип.
 
-        .header-left {{
-            display: flex;
-            align-items: center;
-            gap: 12px;
-        }}
+        Parameters
+        ----------
+        doc: Any
+            Документ Telethon.
+        media_info: Dict[str, Any]
+            Словарь сведений о медиа; дополняется на месте.
 
-        .back-btn {{
-            color: var(--text-color);
-            text-decoration: none;
-            font-size: 24px;
-            transition: opacity 0.2s;
-        }}
+        Returns
+        -------
+        str
+            Тип медиа: первый атрибут аудио или видео, иначе "document".
+        """
+        media_type: Optional[str] = None
+        media_info["document_id"] = doc.id
+        media_info["file_size"] = doc.size
+        media_info["mime_type"] = doc.mime_type
+
+        # Извлечь имя файла и другие атрибуты; тип определяет первый
+        # атрибут аудио или видео
+        for attr in doc.attributes:
+            if isinstance(attr, DocumentAttributeFilename):
+                media_info["file_name"] = attr.file_name
+            elif isinstance(attr, DocumentAttributeVideo):
+                if media_type is None:
+                    media_type = "video_note" if attr.round_message else "video"
+                media_info["duration"] = attr.duration
+                media_info["width"] = attr.w
+                media_info["height"] = attr.h
+            elif isinstance(attr, DocumentAttributeAudio):
+                if media_type is None:
+                    media_type = "voice" if attr.voice else "audio"
+                media_info["duration"] = attr.duration
+            elif isinstance(attr, DocumentAttributeImageSize):
+                media_info["width"] = attr.w
+                media_info["height"] = attr.h
+        return media_type or "document"
 
-        .back-btn:hover {{
-            opacity: 0.7;
-        }}
+    @staticmethod
+    def _coerce_file_size(value: Any) -> int:
+        """
+        Нормализовать размер файла из JSONL.
 
-        .chat-info {{
-            display: flex;
-            flex-direction: column;
-        }}
+        В JSONL `file_size` может быть `null` (None) или не-int (например, строкой).
+        Для UI/HTML это не критично — возвращаем 0, чтобы форматирование не падало.
+        """
+        if value is None:
+            return 0
+        if isinstance(value, bool):
+            return 0
+        if isinstance(value, int):
+            return value
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
 
-        .chat-title {{
-            font-size: 15px;
-            font-weight: 500;
-            color: var(--text-color);
-        }}
+    @staticmethod
+    def _get_photo_file_size(photo: Any) -> Optional[int]:
+        """
+        Попробовать получить размер фото (в байтах) из Telethon объекта.
 
-        .chat-subtitle {{
-            font-size: 13px;
-            color: var(--text-secondary);
-        }}
+        У фото размер часто доступен только на уровне `sizes[*].size` или `len(sizes[*].bytes)`.
+        Возвращаем максимальный известный размер или None.
+        """
+        sizes = getattr(photo, "sizes", None)
+        if not sizes:
+            return None
 
-        .theme-toggle {{
-            background: none;
-            border: none;
-            font-size: 24px;
-            cursor: pointer;
-            padding: 8px;
-            transition: transform 0.2s;
-        }}
+        max_size = 0
+        for s in sizes:
+            s_size = getattr(s, "size", None)
+            if isinstance(s_size, int) and s_size > max_size:
+                max_size = s_size
+                continue
 
-        .theme-toggle:hover {{
-            transform: scale(1.1);
-        }}
+            s_bytes = getattr(s, "bytes", None)
+            if isinstance(s_bytes, (bytes, bytearray)):
+                max_size = max(max_size, len(s_bytes))
 
-        .search-box {{
-            padding: 12px 20px;
-            background: var(--chat-bg);
-            border-bottom: 1px solid var(--border-color);
-            position: sticky;
-            top: 60px;
-            z-index: 99;
-            backdrop-filter: blur(10px);
-        }}
+        return max_size if max_size > 0 else None
 
-        .search-box input {{
-            width: 100%;
-            padding: 10px 16px;
-            border: 1px solid var(--border-color);
-            border-radius: 20px;
-            font-size: 14px;
-            background: var(--message-bg);
-            color: var(--text-color);
-            transition: border-color 0.2s;
-        }}
+    def _check_archive_duplicates(
+        self, archive_path: str, message_ids: List[int], fmt: str
+    ) -> bool:
+        """
+        Проверить, есть ли все сообщения уже в архиве (проверка дублей).
 
-        .search-box input:focus {{
-            outline: none;
-            border-color: var(--accent-color);
-        }}
+        Parameters
+        ----------
+        archive_path: str
+            Путь к архиву.
+        message_ids: List[int]
+            Список ID сообщений для проверки.
+        fmt: str
+            Формат архива ("jsonl" или "txt").
 
-        .messages {{
-            flex: 1;
-            padding: 20px;
-            overflow-y: auto;
-            display: flex;
-            flex-direction: column;
-            gap: 8px;
-        }}
+        Returns
+        -------
+        bool
+            True, если все сообщения уже есть в архиве (можно пропустить сохранение).
+        """
+        if not os.path.exists(archive_path):
+            self._archive_ids.pop(archive_path, None)
+            return False
 
-        .message-bubble {{
-            max-width: 70%;
-            background: var(--message-bg);
-            border-radius: 12px;
-            padding: 8px 12px;
-            position: relative;
-            box-shadow: 0 1px 2px rgba(0,0,0,0.1);
-            animation: fadeIn 0.2s ease-in;
-            align-self: flex-start;
-        }}
+        # Пакет с ID больше любого записанного в неизменённый архив не может
+        # состоять из дублей: архив не открывается вовсе
+        if fmt == "jsonl" and message_ids:
+            watermark = self._archive_max_id(archive_path)
+            if watermark is not None and max(message_ids) > watermark:
+                return False
 
-        @keyframes fadeIn {{
-            from {{ opacity: 0; transform: translateY(10px); }}
-            to {{ opacity: 1; transform: translateY(0); }}
-        }}
+        # Проверить валидность архива
+        if not validate_archive_file(archive_path, fmt):
+            self._archive_ids.pop(archive_path, None)
+            return False
 
-        .message-reply {{
-            background: var(--accent-color);
-            background: linear-gradient(90deg, var(--accent-color) 3px, transparent 3px);
-            padding: 6px 10px;
-            padding-left: 14px;
-            border-radius: 6px;
-            font-size: 13px;
-            color: var(--text-secondary);
-            margin-bottom: 6px;
-        }}
+        if not message_ids:
+            return True
 
-        .message-text {{
-            font-size: 15px;
-            line-height: 1.5;
-            word-wrap: break-word;
-            white-space: pre-wrap;
-            margin: 4px 0;
-        }}
+        # Для TXT: не можем точно проверить, считаем что нужно сохранить
+        if fmt != "jsonl":
+            return False
+        # Для JSONL: проверить наличие всех ID
+        return self._scan_archive_ids(archive_path, set(message_ids))
 
-        .message-link {{
-            color: var(--accent-color);
-            text-decoration: none;
-        }}
+    def _scan_archive_ids(self, archive_path: str, missing: Set[int]) -> bool:
+        """
+        Проверить, что все ID есть в JSONL архиве, по кэшу или чтением файла.
 
-        .message-link:hover {{
-            text-decoration: underline;
-        }}
+        Parameters
+        ----------
+        archive_path: str
+            Путь к архиву.
+        missing: Set[int]
+            ID, которые нужно найти; множество изменяется.
 
-        .message-hashtag {{
-            color: var(--accent-color);
-        }}
+        Returns
+        -------
+        bool
+            True, если все ID найдены.
+        """
+        try:
+            st = os.stat(archive_path)
+        except OSError:
+            return False
+        stat_key = (st.st_mtime_ns, st.st_size)
+        cached = self._archive_ids.get(archive_path)
+        if cached is not None and cached[0] == stat_key:
+            return missing <= cached[1]
+        if st.st_size == 0:
+            return False
 
-        .message-spoiler {{
-            background: var(--text-color);
-            color: var(--text-color);
-            cursor: pointer;
-            user-select: none;
-            transition: background 0.2s, color 0.2s;
-        }}
+        # Поиск по отображённому в память файлу с ранним выходом: строки не
+        # создаются, страницы подгружаются по мере поиска, а как только найдены
+        # все ID пакета, остаток архива не читается
+        existing_ids: Set[Any] = set()
+        try:
+            with open(archive_path, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mm:
+                # Недописанная последняя строка (без перевода строки) не учитывается
+                end = mm.rfind(b"\n") + 1
+                for match in _ARCHIVE_ID_RE.finditer(mm, 0, end):
+                    msg_id = int(match.group(1))
+                    existing_ids.add(msg_id)
+                    if missing:
+                        missing.discard(msg_id)
+                        if not missing:
+                            return True
+        except Exception:
+            return False
 
-        .message-spoiler.revealed {{
-            background: transparent;
-            color: var(--text-color);
-        }}
+        # Архив прочитан целиком: запомнить его ID до следующего изменения файла
+        self._archive_ids[archive_path] = (stat_key, existing_ids)
+        if existing_ids:
+            self._set_archive_max_id(archive_path, stat_key, max(existing_ids))
+        return False
 
-        .message-text code {{
-            background: var(--border-color);
-            padding: 2px 4px;
-            border-radius: 4px;
-            font-family: 'Courier New', monospace;
-            font-size: 0.9em;
-        }}
+    @staticmethod
+    def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+        """Ключ актуальности файла для кэшей: (mtime_ns, размер) или None без файла."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
 
-        .message-text pre {{
-            background: var(--border-color);
-            padding: 8px;
-            border-radius: 4px;
-            overflow-x: auto;
-            font-family: 'Courier New', monospace;
-            font-size: 0.9em;
-        }}
+    def _append_chat_records(
+        self, chat_file: str, records: List[Dict[str, Any]], lines: List[bytes]
+    ) -> None:
+        """
+        Дописать записи в JSONL архив HTML формата и дополнить кэш разобранных записей.
 
-        .message-text blockquote {{
-            border-left: 3px solid var(--accent-color);
-            padding-left: 12px;
-            margin: 4px 0;
-            color: var(--text-secondary);
-        }}
+        Кэш дополняется, только если он соответствовал файлу до записи;
+        иначе он сбрасывается и при следующей генерации HTML архив читается заново.
+        """
+        cached = self._chat_records.get(chat_file)
+        cache_valid = cached is not None and cached[0] == self._stat_key(chat_file)
+        self._append_lines(chat_file, lines)
+        new_key = self._stat_key(chat_file)
+        if cached is not None and cache_valid and new_key is not None:
+            cached[1].extend(records)
+            self._put_chat_records(chat_file, new_key, cached[1])
+        else:
+            self._chat_records.pop(chat_file, None)
+
+    def _put_chat_records(
+        self, chat_file: str, stat_key: Tuple[int, int], records: List[Dict[str, Any]]
+    ) -> None:
+        """Сохранить записи чата в LRU-кэш, вытеснив давно не использованные чаты."""
+        self._chat_records[chat_file] = (stat_key, records)
+        self._chat_records.move_to_end(chat_file)
+        while len(self._chat_records) > _CHAT_RECORDS_CACHE_SIZE:
+            self._chat_records.popitem(last=False)
+
+    def _remember_archive_ids(
+        self,
+        archive_path: str,
+        message_ids: List[int],
+        before_key: Optional[Tuple[int, int]],
+    ) -> None:
+        """
+        Дополнить кэш ID и наибольший ID архива только что записанными сообщениями.
+
+        Кэши дополняются, только если соответствовали файлу до записи
+        (before_key — его (mtime_ns, размер) или None, если файла не было).
+        """
+        new_key = self._stat_key(archive_path)
+        cached = self._archive_ids.get(archive_path)
+        if new_key is not None and before_key is None:
+            # Архив создан этим пакетом: известны все его ID
+            self._archive_ids[archive_path] = (new_key, set(message_ids))
+        elif new_key is None or cached is None or cached[0] != before_key:
+            self._archive_ids.pop(archive_path, None)
+        else:
+            cached[1].update(message_ids)
+            self._archive_ids[archive_path] = (new_key, cached[1])
 
-        .media-preview {{
-            margin: 4px 0;
-            border-radius: 8px;
-            overflow: hidden;
-            max-width: 100%;
-        }}
+        if new_key is None or not message_ids:
+            return
+        batch_max = max(message_ids)
+        if before_key is not None:
+            watermark = self._archive_max_id(archive_path, before_key)
+            if watermark is None:
+                # Неизвестно, что было в архиве до записи
+                self._set_archive_max_id(archive_path, None, 0)
+                return
+            batch_max = max(batch_max, watermark)
+        self._set_archive_max_id(archive_path, new_key, batch_max)
+
+    def _archive_max_id(
+        self, archive_path: str, stat_key: Optional[Tuple[int, int]] = None
+    ) -> Optional[int]:
+        """Наибольший записанный ID архива или None, если архив менялся в обход."""
+        if self._archive_max_ids is None:
+            self._archive_max_ids = self._load_archive_meta()
+        entry = self._archive_max_ids.get(os.path.basename(archive_path))
+        if entry is None:
+            return None
+        if stat_key is None:
+            stat_key = self._stat_key(archive_path)
+        if stat_key is None or (entry[0], entry[1]) != stat_key:
+            return None
+        return entry[2]
 
-        .photo-preview img {{
-            display: block;
-            max-width: 100%;
-            max-height: 500px;
-            width: auto;
-            height: auto;
-            border-radius: 8px;
-            cursor: pointer;
-            transition: transform 0.2s;
-        }}
+    def _set_archive_max_id(
+        self, archive_path: str, stat_key: Optional[Tuple[int, int]], max_id: int
+    ) -> None:
+        """
+        Запомнить наибольший ID архива (stat_key=None — забыть).
 
-        .photo-preview img:hover {{
-            transform: scale(1.02);
-        }}
+        На диск отметки записываются в _flush_archive_meta, один раз на пакет.
+        """
+        if self._archive_max_ids is None:
+            self._archive_max_ids = self._load_archive_meta()
+        name = os.path.basename(archive_path)
+        if stat_key is None:
+            if self._archive_max_ids.pop(name, None) is None:
+                return
+        else:
+            self._archive_max_ids[name] = [stat_key[0], stat_key[1], max_id]
+        self._archive_meta_dirty = True
 
-        .video-preview {{
-            position: relative;
-        }}
+    def _flush_archive_meta(self) -> None:
+        """Записать изменённые отметки в archive_meta.json атомарно (os.replace)."""
+        if not self._archive_meta_dirty or self._archive_max_ids is None:
+            return
+        self._archive_meta_dirty = False
+        tmp_path = f"{self._archive_meta_file}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._archive_max_ids, f)
+            os.replace(tmp_path, self._archive_meta_file)
+        except OSError as e:
+            # Без файла архив просто будет просканирован при следующем запуске
+            logger.warning("Не удалось сохранить %s: %s", self._archive_meta_file, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
-        .video-preview video {{
-            display: block;
-            max-width: 100%;
-            max-height: 500px;
-            width: auto;
-            border-radius: 8px;
-        }}
+    def _load_archive_meta(self) -> Dict[str, List[int]]:
+        """Загрузить archive_meta.json; битые записи пропускаются."""
+        try:
+            with open(self._archive_meta_file, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except Exception:
+            return {}
+        if not isinstance(raw, dict):
+            return {}
+        meta: Dict[str, List[int]] = {}
+        for name, entry in raw.items():
+            if (
+                isinstance(entry, list)
+                and len(entry) == 3
+                and all(isinstance(v, int) and not isinstance(v, bool) for v in entry)
+            ):
+                meta[name] = entry
+        return meta
 
-        .video-duration {{
-            position: absolute;
-            bottom: 8px;
-            right: 8px;
-            background: rgba(0,0,0,0.7);
-            color: white;
-            padding: 2px 6px;
-            border-radius: 4px;
-            font-size: 12px;
-            font-weight: 500;
-        }}
+    def save_batch(
+        self,
+        messages: List[Message],
+        chat_id: int,
+        chat_title: Optional[str] = None,
+        downloaded_files: Optional[Dict[int, str]] = None,
+    ) -> None:
+        """
+        Сохранить пакет сообщений.
 
-        .media-file {{
-            background: var(--message-bg);
-            border: 1px solid var(--border-color);
-            border-radius: 8px;
-            margin: 4px 0;
-        }}
+        Parameters
+        ----------
+        messages: List[Message]
+            Список сообщений для сохранения.
+        chat_id: int
+            ID чата.
+        chat_title: Optional[str]
+            Название чата.
+        downloaded_files: Optional[Dict[int, str]]
+            Словарь {message_id: file_path} для скачанных файлов.
+        """
+        downloaded_files = downloaded_files or {}
+        ext = "txt" if self.history_format == "txt" else "jsonl"
+        path_id = _archive_chat_id_for_path(chat_id)
+        archive_path = os.path.join(self.history_path, f"chat_{path_id}.{ext}")
 
-        .file-download {{
-            display: flex;
-            align-items: center;
-            gap: 12px;
-            padding: 12px;
-            text-decoration: none;
-            color: var(--text-color);
-            transition: background 0.2s;
-        }}
+        # Проверка дублей: если все сообщения уже есть в архиве, пропустить сохранение
+        message_ids = [msg.id for msg in messages]
+        if self._check_archive_duplicates(archive_path, message_ids, ext):
+            logger.info(
+                "Архив чата уже содержит все сообщения: chat_id=%s, path=%s, сообщений=%s (пропуск сохранения)",
+                chat_id,
+                archive_path,
+                len(messages),
+            )
+            # Всё равно обновить индекс HTML, если нужно
+            if self.history_format == "html":
+                self._generate_index_html()
+            return
 
-        .file-download:hover {{
-            background: var(--border-color);
-        }}
+        logger.info(
+            "Сохранение архива чата: chat_id=%s, path=%s, сообщений=%s",
+            chat_id,
+            archive_path,
+            len(messages),
+        )
+        # Записи пакета собираются в памяти: файл открывается и пишется один раз на пакет
+        lines: List[bytes] = []
+        records: List[Dict[str, Any]] = []
+        # Информация о чате обновляется один раз на пакет; дата — последнего
+        # сообщения с датой
+        self._update_chat_info(
+            chat_id,
+            chat_title,
+            len(messages),
+            next((m.date for m in reversed(messages) if m.date), None),
+        )
+        for message in messages:
+            file_path = downloaded_files.get(message.id)
+            if self.history_format in ("json", "jsonl", "html"):
+                message_data = self._build_message_dict(
+                    message,
+                    chat_id,
+                    chat_title,
+                    file_path,
+                    include_entities=self.history_format == "html",
+                )
+                records.append(message_data)
+                lines.append(_jsonl_line(message_data))
+            else:
+                lines.append(self._format_txt_line(message, file_path).encode("utf-8"))
+        if lines:
+            before_key = self._stat_key(archive_path)
+            if self.history_format == "html":
+                self._append_chat_records(archive_path, records, lines)
+            else:
+                self._append_lines(archive_path, lines)
+            if ext == "jsonl":
+                self._remember_archive_ids(archive_path, message_ids, before_key)
+        self._flush_archive_meta()
+        logger.info(
+            "Архив чата сохранён: chat_id=%s, path=%s",
+            chat_id,
+            archive_path,
+        )
 
-        .file-icon {{
-            font-size: 32px;
-            flex-shrink: 0;
-        }}
+        # Добавить найденные чаты из ссылок в список загрузок
+        self._add_found_chats_to_config()
 
-        .file-info {{
-            flex: 1;
-            min-width: 0;
-        }}
+        # Создать/обновить индексный HTML файл после сохранения пакета
+        if self.history_format == "html":
+            self._generate_index_html()
 
-        .file-name {{
-            font-size: 14px;
-            font-weight: 500;
-            overflow: hidden;
-            text-overflow: ellipsis;
-            white-space: nowrap;
-        }}
+    def _save_html_message(
+        self,
+        message: Message,
+        chat_id: int,
+        chat_title: Optional[str],
+        downloaded_file_path: Optional[str] = None
+    ) -> None:
+        """
+        Сохранить сообщение в HTML (буферизация).
 
-        .file-size {{
-            font-size: 13px;
-            color: var(--text-secondary);
-            margin-top: 2px;
-        }}
+        Parameters
+        ----------
+        message: Message
+            Сообщение для сохранения.
+        chat_id: int
+            ID чата.
+        chat_title: Optional[str]
+            Название чата.
+        downloaded_file_path: Optional[str]
+            Путь к скачанному файлу.
+        """
+        # Сохраняем в JSON для последующей генерации HTML (путь без минуса)
+        chat_file = os.path.join(self.history_path, f"chat_{_archive_chat_id_for_path(chat_id)}.jsonl")
+        message_data = self._build_message_dict(
+            message, chat_id, chat_title, downloaded_file_path, include_entities=True
+        )
+        self._append_chat_records(chat_file, [message_data], [_jsonl_line(message_data)])
 
-        .download-icon {{
-            font-size: 20px;
-            flex-shrink: 0;
-        }}
+    def _generate_chat_html(self, chat_id: int) -> None:
+        """
+        Сгенерировать HTML файл для конкретного чата.
 
-        .not-downloaded {{
-            opacity: 0.6;
-        }}
+        Parameters
+        ----------
+        chat_id: int
+            ID чата.
+        """
+        path_id = _archive_chat_id_for_path(chat_id)
+        jsonl_file = os.path.join(self.history_path, f"chat_{path_id}.jsonl")
+        stat_key = self._stat_key(jsonl_file)
+        if stat_key is None:
+            self._chat_records.pop(jsonl_file, None)
+            return
 
-        .media-error {{
-            padding: 20px;
-            text-align: center;
-            background: var(--border-color);
-            border-radius: 8px;
-            color: var(--text-secondary);
-        }}
+        messages: List[Dict[str, Any]]
+        cached = self._chat_records.get(jsonl_file)
+        if cached is not None and cached[0] == stat_key:
+            messages = cached[1]
+            self._chat_records.move_to_end(jsonl_file)
+        else:
+            messages = []
+            with open(jsonl_file, "rb") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        obj = _json_loads(line)
+                    except Exception:
+                        # JSONL может быть частично записан (например, при аварийном завершении).
+                        # Генерация HTML не должна падать из-за одной битой строки.
+                        continue
+                    if isinstance(obj, dict):
+                        messages.append(obj)
+            self._put_chat_records(jsonl_file, stat_key, messages)
 
-        .message-footer {{
-            display: flex;
-            align-items: center;
-            justify-content: flex-end;
-            gap: 6px;
-            margin-top: 4px;
-            font-size: 12px;
-            color: var(--text-secondary);
-        }}
+        if not messages:
+            return
 
-        .message-time {{
-            font-size: 11px;
-        }}
+        # Использовать 'or' вместо default, чтобы обработать None значения
+        chat_title = messages[0].get("chat_title") or f"Чат {chat_id}"
+        html_file = os.path.join(self.history_path, f"chat_{path_id}.html")
 
-        .message-meta {{
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }}
+        html_content = self._get_html_template(chat_title, messages)
 
-        .meta-views, .meta-forwards {{
-            display: flex;
-            align-items: center;
-            gap: 2px;
-        }}
+        with open(html_file, "w", encoding="utf-8") as f:
+            f.write(html_content)
 
-        .meta-edited {{
-            font-style: italic;
-            font-size: 11px;
-        }}
+    def _get_html_template(self, chat_title: str, messages: List[Dict[str, Any]]) -> str:
+        """
+        Создать HTML шаблон для чата.
 
-        .empty-state {{
-            text-align: center;
-            padding: 60px 20px;
-            color: var(--text-secondary);
-        }}
+        Parameters
+        ----------
+        chat_title: str
+            Название чата.
+        messages: List[Dict[str, Any]]
+            Список сообщений.
 
-        @media (max-width: 768px) {{
-            .message-bubble {{
-                max-width: 85%;
-            }}
-        }}
-    </style>
+        Returns
+        -------
+        str
+            HTML контент.
+        """
+        # Фрагменты собираются одним join: конкатенация в цикле копирует строку заново
+        messages_html = "".join([self._format_message_html(msg) for msg in messages])
+        title = html.escape(chat_title)
+
+        return f"""<!DOCTYPE html>
+<html lang="ru">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+{_CSS_BLOCK}
 </head>
 <body data-theme="dark">
     <div class="container">
@@ -974,7 +1387,7 @@ class MessageHistory:
             <div class="header-left">
                 <a href="index.html" class="back-btn">←</a>
                 <div class="chat-info">
-                    <div class="chat-title">{html.escape(chat_title)}</div>
+                    <div class="chat-title">{title}</div>
                     <div class="chat-subtitle">{len(messages)} сообщений</div>
                 </div>
             </div>
@@ -1987,13 +2400,13 @@ class MessageHistory:
             Реальный chat_id из JSONL или None, если не удалось извлечь.
         """
         try:
-            with open(jsonl_path, "r", encoding="utf-8") as f:
+            with open(jsonl_path, "rb") as f:
                 for line in f:
                     line = line.strip()
                     if not line:
                         continue
                     try:
-                        obj = json.loads(line)
+                        obj = _json_loads(line)
                         if isinstance(obj, dict) and "chat_id" in obj:
                             chat_id = obj["chat_id"]
                             if isinstance(chat_id, int):
@@ -2018,11 +2431,11 @@ class MessageHistory:
 
         title: str = f"Chat {chat_id}"
         message_count = 0
-        first_line: Optional[str] = None
-        last_line: Optional[str] = None
+        first_line: Optional[bytes] = None
+        last_line: Optional[bytes] = None
 
         try:
-            with open(jsonl_path, "r", encoding="utf-8") as f:
+            with open(jsonl_path, "rb") as f:
                 for line in f:
                     line = line.strip()
                     if not line:
@@ -2034,11 +2447,11 @@ class MessageHistory:
         except Exception:
             return None
 
-        def _safe_parse_title(line: Optional[str]) -> Optional[str]:
+        def _safe_parse_title(line: Optional[bytes]) -> Optional[str]:
             if not line:
                 return None
             try:
-                obj = json.loads(line)
+                obj = _json_loads(line)
             except Exception:
                 return None
             if isinstance(obj, dict):
@@ -2054,7 +2467,7 @@ class MessageHistory:
         last_message_date: Optional[datetime] = None
         if last_line:
             try:
-                obj = json.loads(last_line)
+                obj = _json_loads(last_line)
                 if isinstance(obj, dict) and obj.get("date"):
                     last_message_date = datetime.fromisoformat(str(obj["date"]))
             except Exception:
@@ -2069,7 +2482,7 @@ class MessageHistory:
         if isinstance(value, datetime):
             return value
         try:
-            return datetime.fromisoformat(str(value))
+            return _parse_iso_str(str(value))
         except Exception:
             return None
 
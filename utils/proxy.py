@@ -1,20 +1,20 @@
 """Модуль для работы с прокси."""
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Mapping, Optional
 
 import socks
 
 logger = logging.getLogger(__name__)
 
 
-def get_proxy_config(config: Dict[str, Any]) -> Optional[tuple]:
+def get_proxy_config(config: Mapping[str, Any]) -> Optional[tuple]:
     """
     Получить конфигурацию прокси из настроек.
 
     Parameters
     ----------
-    config: Dict[str, Any]
-        Конфигурация приложения.
+    config: Mapping[str, Any]
+        Конфигурация приложения (например, ConfigManager.view).
 
     Returns
     -------
@@ -78,54 +78,68 @@ def validate_proxy_config(proxy_config: Optional[Dict[str, Any]]) -> bool:
     bool
         True если конфигурация валидна или отсутствует, False если невалидна.
     """
+    error = proxy_config_error(proxy_config)
+    if error is not None:
+        logger.error(error)
+        return False
+    return True
+
+
+def proxy_config_error(proxy_config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Проверить конфигурацию прокси без записи в лог.
+
+    Parameters
+    ----------
+    proxy_config: Optional[Dict[str, Any]]
+        Конфигурация прокси.
+
+    Returns
+    -------
+    Optional[str]
+        Текст ошибки или None, если конфигурация валидна или отсутствует.
+    """
     if not proxy_config:
-        return True
+        return None
 
     # Проверка типа
     if not isinstance(proxy_config, dict):
-        logger.error("❌ proxy должен быть словарем")
-        return False
+        return "❌ proxy должен быть словарем"
 
     # Проверка обязательных полей
     required_fields = ["scheme", "hostname", "port"]
     for field in required_fields:
         if field not in proxy_config:
-            logger.error(f"❌ Отсутствует обязательное поле прокси: {field}")
-            return False
+            return f"❌ Отсутствует обязательное поле прокси: {field}"
 
     # Проверка scheme
     valid_schemes = ["socks4", "socks5", "http"]
     scheme = proxy_config["scheme"].lower()
     if scheme not in valid_schemes:
-        logger.error(
+        return (
             f"❌ Некорректный тип прокси: {scheme}. "
             f"Допустимые: {', '.join(valid_schemes)}"
         )
-        return False
 
     # Проверка hostname
     hostname = proxy_config["hostname"]
     if not isinstance(hostname, str) or not hostname.strip():
-        logger.error("❌ hostname прокси должен быть непустой строкой")
-        return False
+        return "❌ hostname прокси должен быть непустой строкой"
 
     # Проверка port
     port = proxy_config["port"]
     if not isinstance(port, int) or not (1 <= port <= 65535):
-        logger.error(f"❌ Некорректный порт прокси: {port} (должен быть 1-65535)")
-        return False
+        return f"❌ Некорректный порт прокси: {port} (должен быть 1-65535)"
 
     # Проверка необязательных полей
     if "username" in proxy_config:
         username = proxy_config["username"]
         if not isinstance(username, str):
-            logger.error("❌ username прокси должен быть строкой")
-            return False
+            return "❌ username прокси должен быть строкой"
 
     if "password" in proxy_config:
         password = proxy_config["password"]
         if not isinstance(password, str):
-            logger.error("❌ password прокси должен быть строкой")
-            return False
+            return "❌ password прокси должен быть строкой"
 
-    return True
+    return None